@@ -0,0 +1,122 @@
+"""
+Recall-vs-latency comparison of binary-quantized vector search
+against exact cosine search, run against the live database.
+
+Samples stored embeddings as queries, runs both search modes for
+each, and reports recall@k of the binary mode (overlap with the
+exact top-k) and per-query latency, plus on-disk column and index
+sizes for each table.
+
+The binary-quantized columns only exist while the bot runs with
+VECTOR_SEARCH_MODE=binary, so start it that way once first.
+
+Usage (from src/app):
+    python bench_vector_search.py [--queries 50] [--k 15]
+"""
+import time
+import argparse
+import statistics
+
+from sqlalchemy import text
+
+from database.database import engine
+from database.migrations import EMBEDDING_TABLES
+from cogs.memory_manager import _vector_search_sync
+
+
+def _sample_queries(table, count):
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            f"SELECT CAST(embedding AS text) FROM {table} "
+            f"WHERE embedding IS NOT NULL "
+            f"ORDER BY random() LIMIT :n"
+        ), {"n": count}).fetchall()
+    return [
+        [float(v) for v in row[0].strip('[]').split(',')]
+        for row in rows
+    ]
+
+
+def _storage_report(table):
+    with engine.begin() as conn:
+        row = conn.execute(text(
+            f"SELECT avg(pg_column_size(embedding)), "
+            f"avg(pg_column_size(embedding_bits)), "
+            f"pg_total_relation_size(CAST(:t AS regclass)) "
+            f"FROM {table}"
+        ), {"t": table}).fetchone()
+        index_rows = conn.execute(text(
+            "SELECT indexname, "
+            "pg_relation_size(CAST(indexname AS regclass)) "
+            "FROM pg_indexes WHERE tablename = :t"
+        ), {"t": table}).fetchall()
+    return row, index_rows
+
+
+def _timed(table, vec, k, mode, factor=None):
+    start = time.perf_counter()
+    ids = _vector_search_sync(None, table, vec, k, mode, factor)
+    return ids, (time.perf_counter() - start) * 1000
+
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def run(queries, k, factors):
+    for table in EMBEDDING_TABLES:
+        vecs = _sample_queries(table, queries)
+        print(f"\n== {table} ({len(vecs)} queries, k={k}) ==")
+        if not vecs:
+            print("no embedded rows, skipping")
+            continue
+
+        sizes, indexes = _storage_report(table)
+        print(
+            f"avg embedding bytes: {sizes[0]:.0f}, "
+            f"avg embedding_bits bytes: {sizes[1]:.0f}, "
+            f"table+indexes: {sizes[2] / 1024:.0f} KiB"
+        )
+        for name, size in indexes:
+            print(f"  index {name}: {size / 1024:.0f} KiB")
+
+        exact = []
+        exact_ms = []
+        for vec in vecs:
+            ids, ms = _timed(table, vec, k, 'exact')
+            exact.append(set(ids))
+            exact_ms.append(ms)
+
+        print(f"{'mode':<16}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        print(
+            f"{'exact':<16}{1.0:>10.3f}"
+            f"{statistics.median(exact_ms):>10.2f}"
+            f"{_p95(exact_ms):>10.2f}"
+        )
+        for factor in factors:
+            recalls = []
+            latencies = []
+            for vec, truth in zip(vecs, exact):
+                ids, ms = _timed(table, vec, k, 'binary', factor)
+                latencies.append(ms)
+                if truth:
+                    recalls.append(len(truth & set(ids)) / len(truth))
+            print(
+                f"{'binary x' + str(factor):<16}"
+                f"{statistics.mean(recalls):>10.3f}"
+                f"{statistics.median(latencies):>10.2f}"
+                f"{_p95(latencies):>10.2f}"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument(
+        '--factors', type=int, nargs='+', default=[1, 2, 4, 8],
+        help="Hamming candidates per result to compare"
+    )
+    args = parser.parse_args()
+    run(args.queries, args.k, args.factors)
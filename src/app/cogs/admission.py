@@ -0,0 +1,170 @@
+"""
+Admission control for unprompted chime-ins.
+
+A chime-in has to pass a probability check and then take a token
+from both its channel's bucket and a global bucket. The probability
+starts at the base or keyword chance and is scaled down by:
+
+- channel volume: busy channels don't get proportionally more
+  chime-ins; the expected rate is held near TARGET_CHIME_INS_PER_HOUR
+- LLM queue depth: nothing is admitted while user-facing calls are
+  queueing
+- the hourly LLM call budget: the closer the scheduler is to
+  LLM_HOURLY_BUDGET calls in the last hour, the rarer chime-ins get
+"""
+import os
+import math
+import time
+import random
+
+from cogs.state_store import TTLMap
+
+CHIME_IN_HOURLY_BUDGET = int(os.getenv('CHIME_IN_HOURLY_BUDGET', '30'))
+LLM_HOURLY_BUDGET = int(os.getenv('LLM_HOURLY_BUDGET', '600'))
+# Global burst size; the bucket refills at CHIME_IN_HOURLY_BUDGET/h
+GLOBAL_BURST = 3
+# Per channel: one chime-in, refilled every CHANNEL_COOLDOWN seconds
+CHANNEL_COOLDOWN = 120
+TARGET_CHIME_INS_PER_HOUR = 6
+# Calls waiting in the LLM scheduler at which chime-ins stop
+MAX_QUEUE_DEPTH = 4
+# Half-life of the per-channel message rate estimate
+RATE_HALF_LIFE = 300
+# Channel state idle this long is dropped; by then its bucket is
+# full and its rate estimate has decayed to nothing
+CHANNEL_STATE_TTL = 3600
+
+
+class TokenBucket:
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate  # tokens per second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def level(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        return self.tokens
+
+    def take(self):
+        if self.level() >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class _ChannelState:
+    __slots__ = ('bucket', 'rate', 'rate_updated', 'admitted',
+                 'rejected')
+
+    def __init__(self):
+        self.bucket = TokenBucket(1, 1 / CHANNEL_COOLDOWN)
+        self.rate = 0.0  # messages per hour, decayed
+        self.rate_updated = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+
+    def observe(self):
+        """Count one message in the decayed rate estimate."""
+        now = time.monotonic()
+        decay = 0.5 ** ((now - self.rate_updated) / RATE_HALF_LIFE)
+        # Scaled so a steady stream of r msgs/hour converges on r
+        self.rate = (
+            self.rate * decay + 3600 * math.log(2) / RATE_HALF_LIFE
+        )
+        self.rate_updated = now
+
+    def current_rate(self):
+        elapsed = time.monotonic() - self.rate_updated
+        return self.rate * 0.5 ** (elapsed / RATE_HALF_LIFE)
+
+
+class ChimeInController:
+    def __init__(self, scheduler=None):
+        # LLMScheduler, for queue depth and calls in the last hour
+        self.scheduler = scheduler
+        self.global_bucket = TokenBucket(
+            GLOBAL_BURST, CHIME_IN_HOURLY_BUDGET / 3600
+        )
+        # channel_id -> _ChannelState
+        self._channels = TTLMap('admission', CHANNEL_STATE_TTL)
+        self.last_decision = None
+
+    def _channel(self, channel_id):
+        state = self._channels.get(channel_id)
+        if state is None:
+            state = _ChannelState()
+            self._channels[channel_id] = state
+        return state
+
+    def observe(self, channel_id):
+        """Call for every human message, chime-in candidate or not."""
+        self._channel(channel_id).observe()
+        self._channels.touch(channel_id)
+
+    def probability(self, channel_id, base_chance):
+        """base_chance scaled to volume, queue depth and budget."""
+        p = base_chance
+        rate = self._channel(channel_id).current_rate()
+        if rate * base_chance > TARGET_CHIME_INS_PER_HOUR:
+            p = TARGET_CHIME_INS_PER_HOUR / rate
+        if self.scheduler is not None:
+            if self.scheduler.queue_depth() >= MAX_QUEUE_DEPTH:
+                return 0.0
+            used = self.scheduler.calls_in_last_hour() / LLM_HOURLY_BUDGET
+            p *= max(0.0, 1.0 - used)
+        return p
+
+    def admit(self, channel_id, base_chance):
+        """Decide one chime-in. Returns True if it may go ahead."""
+        state = self._channel(channel_id)
+        p = self.probability(channel_id, base_chance)
+        if random.random() >= p:
+            reason = 'chance'
+        elif state.bucket.level() < 1:
+            reason = 'channel bucket'
+        elif not self.global_bucket.take():
+            reason = 'global bucket'
+        else:
+            state.bucket.take()
+            reason = None
+        if reason is None:
+            state.admitted += 1
+        else:
+            state.rejected += 1
+        self.last_decision = {
+            'channel_id': channel_id, 'probability': round(p, 4),
+            'admitted': reason is None, 'reason': reason,
+        }
+        return reason is None
+
+    def state(self):
+        """Snapshot of the controller for inspection."""
+        snapshot = {
+            'global_tokens': round(self.global_bucket.level(), 2),
+            'global_burst': GLOBAL_BURST,
+            'chime_in_hourly_budget': CHIME_IN_HOURLY_BUDGET,
+            'last_decision': self.last_decision,
+            'channels': {
+                channel_id: {
+                    'msgs_per_hour': round(state.current_rate(), 1),
+                    'tokens': round(state.bucket.level(), 2),
+                    'admitted': state.admitted,
+                    'rejected': state.rejected,
+                }
+                for channel_id, state in self._channels.items()
+            },
+        }
+        if self.scheduler is not None:
+            snapshot['llm_queue_depth'] = self.scheduler.queue_depth()
+            snapshot['llm_calls_last_hour'] = (
+                self.scheduler.calls_in_last_hour()
+            )
+            snapshot['llm_hourly_budget'] = LLM_HOURLY_BUDGET
+        return snapshot
@@ -1,14 +1,37 @@
 import os
+import re
 import json
 import time
 import random
 import asyncio
 import logging
 import discord
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
 from discord.ext import commands
-from database.orm import UserMemory, BotMemory, UserSentiment
+from database.orm import UserMemory, BotMemory
 from cogs import memory_manager
+from cogs.memory_manager import EpisodeMessage
+from cogs.llm import (
+    text_block, LLMScheduler, PRIORITY_MENTION,
+    PRIORITY_ENGAGED, PRIORITY_CHIME_IN, PRIORITY_BACKGROUND,
+)
+from cogs.message_buffer import MessageBuffer, MessageRecord
+from cogs.emoji_picker import EmojiIndex
+from cogs.sentiment_cache import SentimentCache
+from cogs import memory_blocks
+from cogs.memory_blocks import MemoryBlockCache
+from cogs.reply_coordinator import ReplyCoordinator
+from cogs.admission import ChimeInController
+from cogs.extraction_queue import ExtractionQueue
+from cogs.extraction_gate import ExtractionGate
+from cogs.episode_log import EpisodeLog
+from cogs.state_store import (
+    TTLMap, deep_sizeof, vector_cache_sizeof, format_size,
+)
+from cogs.engagement import (
+    EngagementClassifier, decide, ENGAGEMENT_SHADOW,
+)
 
 logger = logging.getLogger('bangabot')
 
@@ -46,37 +69,217 @@ SYSTEM_PROMPT = (
     "include [REACT] as part of a longer message."
 )
 
+EXTRACTION_PROMPT = (
+    "You are a memory extraction system for a Discord "
+    "bot called BangaBot. Analyze this conversation and "
+    "decide if anything is worth remembering long-term."
+    "\n\nThe DEFAULT response is empty arrays. Most "
+    "conversations — even good ones — have NOTHING "
+    "worth remembering. Only extract facts that would "
+    "still be useful WEEKS from now:\n"
+    "- Personal details someone shared (pets, job, "
+    "location, hobbies, real life events)\n"
+    "- Strong preferences or opinions they'd still "
+    "hold next month\n"
+    "- Inside jokes that actually landed and would "
+    "be funny to reference later\n"
+    "- Corrections to previously known facts\n\n"
+    "Do NOT remember:\n"
+    "- Routine greetings, small talk, or casual "
+    "banter\n"
+    "- Temporary states (\"I'm tired\", moods)\n"
+    "- Game results or ephemeral events\n"
+    "- How the conversation went or interaction "
+    "patterns (\"user said bye three times\", "
+    "\"user tested a feature\")\n"
+    "- Meta-observations about the conversation "
+    "itself\n"
+    "- Anything that just rephrases an existing "
+    "memory\n"
+    "- Anything about BangaBot's own behavior or "
+    "responses\n\n"
+    "Bot memories should be RARE. Only save bot "
+    "memories for genuinely notable server events, "
+    "real inside jokes, or significant group dynamics "
+    "— not routine interactions or conversation "
+    "summaries.\n\n"
+    "SENTIMENT EVALUATION:\n"
+    "Also evaluate whether BangaBot's opinion of each "
+    "participant should shift. The score ranges from "
+    "-5.0 (nemesis) to +5.0 (best friend). Current "
+    "scores are shown below.\n\n"
+    "The default delta is 0. For users you already "
+    "have an opinion of, sentiment should rarely "
+    "change — only when something genuinely notable "
+    "happens. A normal pleasant conversation is NOT "
+    "a reason to shift an established opinion.\n\n"
+    "However, for users at score 0 (no opinion yet), "
+    "be a bit more willing to form an initial "
+    "impression. First impressions matter — if someone "
+    "is being funny, engaging, rude, or annoying in "
+    "their first real interaction, a small delta "
+    "(0.1 to 0.5) is reasonable.\n\n"
+    "Scale guide for delta (max -1.0 to +1.0):\n"
+    "- 0: No change (default for established scores)\n"
+    "- 0.1 to 0.25: Mild impression or slight shift\n"
+    "- 0.25 to 0.5: Notable interaction\n"
+    "- 0.5 to 1.0: Exceptional — truly standout, "
+    "very rare\n\n"
+    "What moves sentiment:\n"
+    "- UP: Being funny, engaging genuinely, sharing "
+    "something personal, being a good hang\n"
+    "- DOWN: Being rude or hostile, reposting "
+    "(bot's pet peeve), being annoying or dismissive\n"
+    "\n"
+    "When in doubt, use 0.\n\n"
+)
+
+# Follows the participants, sentiment, memories and conversation
+EXTRACTION_FORMAT = (
+    "IMPORTANT: Use the exact Discord ID numbers above "
+    "as user_id values, not display names.\n\n"
+    "Respond with JSON only. If nothing is worth "
+    "remembering and no sentiment changes, respond "
+    "with:\n"
+    "{\"user_memories\": [], \"bot_memories\": [], "
+    "\"sentiment_updates\": []}\n\n"
+    "Otherwise:\n"
+    "{\n"
+    "  \"user_memories\": [\n"
+    "    {\"user_id\": \"<discord_id>\", "
+    "\"user_name\": \"<name>\", "
+    "\"fact\": \"<concise fact>\", "
+    "\"importance\": <1|2|3>, "
+    "\"update_existing\": \"<old fact to replace or "
+    "null>\"}\n"
+    "  ],\n"
+    "  \"bot_memories\": [\n"
+    "    {\"category\": \"<event|joke|relationship"
+    "|self>\", \"fact\": \"<concise fact>\", "
+    "\"importance\": <1|2|3>, "
+    "\"related_user_ids\": \"<comma-sep ids or null>\","
+    " \"update_existing\": \"<old fact to replace or "
+    "null>\"}\n"
+    "  ],\n"
+    "  \"sentiment_updates\": [\n"
+    "    {\"user_id\": \"<discord_id>\", "
+    "\"user_name\": \"<name>\", "
+    "\"delta\": \"<float -1.0 to +1.0>\", "
+    "\"reason\": \"<why the shift>\"}\n"
+    "  ]\n"
+    "}\n\n"
+    "IMPORTANCE LEVELS:\n"
+    "3 = identity-defining (name, job, location, "
+    "family)\n"
+    "2 = notable preference/hobby/opinion (default)\n"
+    "1 = lighter facts, inside jokes, one-off details"
+)
+
 BASE_CHANCE = 0.02
 KEYWORD_CHANCE = 0.15
-COOLDOWN_SECONDS = 120
 ENGAGEMENT_SECONDS = 120
+# Stream replies and send each sentence as soon as it completes
+STREAM_RESPONSES = (
+    os.getenv('STREAM_RESPONSES', 'true').lower() == 'true'
+)
+REACT_SENTINEL = "[REACT]"
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+BOT_PREFIXES = [
+    "BangaBot: ", "BangaBot:",
+    "bangabot: ", "bangabot:",
+]
 IS_PRODUCTION = (
     os.getenv('ENVIRONMENT', 'prod') == 'prod'
     and 'PR_NUMBER' not in os.environ
 )
 
 
+# Memory retrieval latency budget (seconds) per reply priority
+RETRIEVAL_BUDGETS = {
+    PRIORITY_MENTION: 1.0,
+    PRIORITY_ENGAGED: 1.5,
+    PRIORITY_CHIME_IN: 3.0,
+}
+# How long speculative retrieval stays usable for a reply
+SPECULATION_TTL = 30
+
+
+class _Speculation:
+    __slots__ = ('expires', 'participants', 'key', 'task')
+
+    def __init__(self, expires):
+        self.expires = expires
+        self.participants = None
+        self.key = None
+        self.task = None
+
+
 EPISODE_GAP_SECONDS = 1800  # 30 minutes
 EPISODE_VOLUME_THRESHOLD = 50
 EPISODE_MIN_MESSAGES = 5
+# Episode summaries being generated at once; the rest wait their turn
+SUMMARY_CONCURRENCY = 2
+# How often older summaries are rolled up into day, week and month
+# summaries
+SUMMARY_COMPACTION_SECONDS = 3600
+
+# Expired per-channel state is swept this often; the episode gap
+# trigger fires from the sweep, so it can run up to this late
+STATE_SWEEP_SECONDS = 60
+# Log a memory report every this many sweeps
+MEMORY_REPORT_EVERY = 10
 
 
 class Chat(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.channel_cooldowns = {}
-        self.engaged_channels = {}  # channel_id -> last_response_timestamp
-        # Episode tracking: channel_id -> list of message dicts
-        self.channel_episodes = {}
-        # Per-channel message count since last episode summary
-        self.channel_msg_counts = {}
+        # channel_id -> last_response_timestamp
+        self.engaged_channels = TTLMap('engaged', ENGAGEMENT_SECONDS)
+        # Episode tracking: channel_id -> deque of EpisodeMessage. An
+        # episode that goes quiet for the gap expires and is summarized
+        self.channel_episodes = TTLMap(
+            'episodes', EPISODE_GAP_SECONDS,
+            on_expire=self._summarize_episode,
+        )
+        # Recent messages per channel, fed from gateway events
+        self.history = MessageBuffer()
+        self.engagement = EngagementClassifier()
+        self.emoji_index = EmojiIndex()
+        # All sentiment reads are served from here
+        self.sentiments = SentimentCache()
+        self.block_cache = MemoryBlockCache()
+        # channel_id -> _Speculation started by typing or a mention
+        self.speculations = TTLMap('speculations', SPECULATION_TTL)
+        # channel_id -> in-flight REST history fetch for a cold channel
+        self._history_fetches = {}
+        self.speculation_hits = 0
+        # Replies sent with retrieval cut short, and per stage
+        self.degraded_replies = 0
+        self.degradations = {}
+        # One active reply per channel; bursts are coalesced
+        self.replies = ReplyCoordinator(self._generate_response)
+        # Memory extraction, debounced per channel and gated
+        self.extraction_gate = ExtractionGate()
+        self.extraction_queue = ExtractionQueue(
+            self._extract_memories, self.history.recent
+        )
         self._backfill_done = False
+        self._sweeper = None
+        self._compactor = None
+        self._summary_slots = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        # Persists episode buffers so they survive restarts
+        self.episode_log = EpisodeLog()
+        self.llm = None
 
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if api_key:
             try:
                 from anthropic import AsyncAnthropic
-                self.client = AsyncAnthropic(api_key=api_key)
+                # Retries are handled by the scheduler
+                self.client = AsyncAnthropic(
+                    api_key=api_key, max_retries=0
+                )
+                self.llm = LLMScheduler(self.client)
                 logger.info("Anthropic client initialized for Chat cog")
             except Exception as e:
                 logger.error(
@@ -88,6 +291,7 @@ class Chat(commands.Cog):
                 "ANTHROPIC_API_KEY not set - Chat cog will be disabled"
             )
             self.client = None
+        self.admission = ChimeInController(self.llm)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -101,13 +305,22 @@ class Chat(commands.Cog):
             logger.debug("Chat cog skipping - no client")
             return
 
-        # Skip own messages and other bots
-        if message.author == self.bot.user:
-            return
-        if message.author.bot:
+        # Buffer every message (including our own) for history
+        self.history.append(message)
+
+        # Skip other bots
+        is_own = message.author == self.bot.user
+        if message.author.bot and not is_own:
             return
 
         is_dm = isinstance(message.channel, discord.DMChannel)
+        if not (is_dm and IS_PRODUCTION):
+            # Every message, ours included, goes into the channel's
+            # episode, so summaries cover the whole conversation
+            self._track_episode_message(message, is_bot=is_own)
+        if is_own:
+            return
+        self.admission.observe(message.channel.id)
 
         # Allow DMs only in dev/test environments
         if is_dm and IS_PRODUCTION:
@@ -122,17 +335,175 @@ class Chat(commands.Cog):
         )
 
         engaged = False
-        if not mentioned:
+        if mentioned:
+            # Retrieval can start now, even if the reply has to wait
+            # behind one already being sent in this channel
+            self._speculate(message.channel)
+        else:
             engaged = await self._check_engagement(message)
             if engaged is None:
                 return
 
-        try:
-            await self._generate_response(
-                message, mentioned, engaged
+        self.replies.submit(message, mentioned, engaged)
+
+    async def cog_load(self):
+        await self.sentiments.load()
+        await self._restore_episodes()
+        self.episode_log.start()
+        self._sweeper = asyncio.create_task(self._sweep_state())
+        self._compactor = asyncio.create_task(self._compact_summaries())
+
+    async def cog_unload(self):
+        for task in (self._sweeper, self._compactor):
+            if task is not None:
+                task.cancel()
+        await self.episode_log.stop()
+        # Don't drop open extraction windows on reload
+        self.extraction_queue.flush_all()
+
+    def _state_maps(self):
+        return [
+            self.history._channels, self.engaged_channels,
+            self.channel_episodes, self.speculations,
+            self.admission._channels,
+            self.extraction_queue._extracted_to,
+        ]
+
+    async def _sweep_state(self):
+        """Drop expired per-channel state, and now and then log how
+        much memory the cog's structures hold."""
+        sweeps = 0
+        while True:
+            await asyncio.sleep(STATE_SWEEP_SECONDS)
+            try:
+                for state in self._state_maps():
+                    state.sweep()
+                sweeps += 1
+                if sweeps % MEMORY_REPORT_EVERY == 0:
+                    logger.info(
+                        "Chat memory: " + ", ".join(
+                            f"{name} {format_size(size)}"
+                            for name, size, _count in self.memory_report()
+                        )
+                    )
+                    logger.info(
+                        "Chat activity: " + ", ".join(
+                            f"{name} {value}"
+                            for name, value in self.activity_report()
+                        )
+                    )
+            except Exception as e:
+                logger.error(f"State sweep failed: {e}")
+
+    async def _compact_summaries(self):
+        while True:
+            await asyncio.sleep(SUMMARY_COMPACTION_SECONDS)
+            if self.llm is None:
+                continue
+            try:
+                await memory_manager.compact_summaries(self.llm)
+            except Exception as e:
+                logger.error(f"Summary compaction failed: {e}")
+
+    def memory_report(self):
+        """(name, approx bytes, entries) for each in-memory
+        structure."""
+        structures = [
+            ('history', self.history._channels),
+            ('engaged', self.engaged_channels),
+            ('episodes', self.channel_episodes),
+            ('speculations', self.speculations),
+            ('admission', self.admission._channels),
+            ('extracted_to', self.extraction_queue._extracted_to),
+            ('block_cache', self.block_cache._entries),
+            ('sentiments', self.sentiments._rows),
+        ]
+        report = [
+            (name, deep_sizeof(obj), len(obj))
+            for name, obj in structures
+        ]
+        cache = memory_manager._embedding_cache
+        report.append(
+            ('window_embeddings', vector_cache_sizeof(cache), len(cache))
+        )
+        return report
+
+    def activity_report(self):
+        """(name, value) for the reply pipeline's counters."""
+        return [
+            ('active_replies', self.replies.active_count()),
+            ('speculation_hits', self.speculation_hits),
+            ('extractions_per_reply',
+             f"{self.extraction_queue.extraction_ratio():.2f}"),
+        ]
+
+    @commands.command(name='chatmem')
+    @commands.is_owner()
+    async def chat_memory(self, ctx):
+        """Shows approximate memory held by the Chat cog's state,
+        and the reply pipeline's counters"""
+        lines = [
+            f"{name:<18} {count:>6} {format_size(size):>10}"
+            for name, size, count in self.memory_report()
+        ]
+        lines.append("")
+        lines.extend(
+            f"{name:<24} {value:>10}"
+            for name, value in self.activity_report()
+        )
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    @commands.command(name='chimein')
+    @commands.is_owner()
+    async def chimein_status(self, ctx):
+        """Shows the chime-in admission controller's state"""
+        state = json.dumps(
+            self.admission.state(), indent=2, default=str
+        )
+        await ctx.send(f"```json\n{state[:1900]}\n```")
+
+    @commands.Cog.listener()
+    async def on_typing(self, channel, user, when):
+        if self.client is None or getattr(user, 'bot', False):
+            return
+        if isinstance(channel, discord.DMChannel):
+            likely_reply = not IS_PRODUCTION
+        else:
+            last_engaged = self.engaged_channels.get(channel.id, 0)
+            likely_reply = (
+                time.time() - last_engaged < ENGAGEMENT_SECONDS
             )
-        except Exception as e:
-            logger.error(f"Chat cog error: {e}")
+        if likely_reply:
+            self._speculate(channel, typist=user)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        # Raw events fire whether or not the message is in the client
+        # cache, so edits of messages from before a restart still
+        # reach the buffer. Embed-only updates carry no content.
+        content = payload.data.get('content')
+        if content is not None:
+            self.history.edit(
+                payload.channel_id, payload.message_id, content
+            )
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.history.delete(payload.channel_id, payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self.history.delete(payload.channel_id, message_id)
+
+    @commands.Cog.listener()
+    async def on_guild_emojis_update(self, guild, before, after):
+        self.emoji_index.invalidate(guild.id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # A fresh gateway session may have missed message events
+        self.history.invalidate()
 
     async def _check_engagement(self, message):
         """Decide whether to respond to a non-mentioned message.
@@ -159,8 +530,9 @@ class Chat(commands.Cog):
                 )
                 return True
 
-            # Outside grace period — ask Claude if we should respond
-            should = await self._should_engage(message)
+            # Outside grace period — classify locally, asking
+            # Claude only when the classifier is unsure
+            should = await self._should_engage(message, elapsed)
             if not should:
                 return None
             channel_name = (
@@ -176,48 +548,104 @@ class Chat(commands.Cog):
         # Clear stale engagement
         self.engaged_channels.pop(channel_id, None)
 
-        # Check random chime-in chance
+        # Random chime-in, scaled and rate-limited by the
+        # admission controller
         content_lower = message.content.lower()
         has_keyword = any(kw in content_lower for kw in KEYWORDS)
         chance = KEYWORD_CHANCE if has_keyword else BASE_CHANCE
 
-        if random.random() >= chance:
+        if not self.admission.admit(channel_id, chance):
             return None
-
-        # Check per-channel cooldown for unprompted messages
-        last_time = self.channel_cooldowns.get(channel_id, 0)
-        if now - last_time < COOLDOWN_SECONDS:
-            return None
-
-        self.channel_cooldowns[channel_id] = now
         return False
 
-    async def _fetch_history(self, channel, fallback_message):
-        """Fetch recent messages from the channel."""
-        history = []
+    async def _fetch_history(self, channel, fallback_message,
+                             limit=None):
+        """Recent messages in the channel as MessageRecords.
+
+        Served from the in-memory buffer; only a cold channel pays
+        for a REST fetch, which then seeds the buffer.
+        """
+        if not self.history.is_warm(channel.id):
+            # Speculation and the reply it runs ahead of both land
+            # here for a cold channel; they share one fetch
+            task = self._history_fetches.get(channel.id)
+            if task is None:
+                task = asyncio.create_task(self._seed_history(channel))
+                self._history_fetches[channel.id] = task
+                task.add_done_callback(
+                    lambda _t: self._history_fetches.pop(channel.id, None)
+                )
+            # Shielded so a cancelled caller doesn't cancel the fetch
+            # for the other
+            if not await asyncio.shield(task):
+                if fallback_message is None:
+                    return []
+                return [MessageRecord.from_message(fallback_message)]
+        return self.history.recent(channel.id, limit)
+
+    async def _seed_history(self, channel):
+        """Seed a cold channel's buffer from REST. Returns False if
+        the fetch failed."""
+        self.history.track(channel.id)
+        fetched = []
         try:
-            async for msg in channel.history(limit=20):
-                history.append(msg)
+            async for msg in channel.history(limit=self.history.size):
+                fetched.append(msg)
         except Exception as e:
             logger.error(f"Failed to fetch channel history: {e}")
-            return [fallback_message]
-        history.reverse()
-        return history
+            return False
+        self.history.seed(channel.id, fetched)
+        return True
+
+    async def _should_engage(self, message, elapsed):
+        """Decide if the bot should respond in an engaged channel.
+
+        The local classifier settles confident cases; uncertain
+        ones fall back to a quick Claude YES/NO call.
+        """
+        try:
+            history = await self._fetch_history(message.channel, message)
+            probability, features = await self.engagement.classify(
+                message, history, self.bot.user.id, elapsed,
+                ENGAGEMENT_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Engagement classifier failed: {e}")
+            history, probability, features = None, None, None
+
+        if probability is not None:
+            decision = decide(probability)
+            if decision is not None and not ENGAGEMENT_SHADOW:
+                self.engagement.record(probability, features, decision)
+                logger.debug(
+                    f"Engagement decided locally: {decision} "
+                    f"(p={probability:.2f})"
+                )
+                return decision
+
+        answer = await self._ask_should_engage(message, history)
+        if probability is not None:
+            self.engagement.record(
+                probability, features, answer, llm_answer=answer
+            )
+        return answer
 
-    async def _should_engage(self, message):
+    async def _ask_should_engage(self, message, history=None):
         """Quick Claude call to decide if the bot should respond."""
         try:
-            history = []
-            async for msg in message.channel.history(limit=5):
-                history.append(msg)
-            history.reverse()
+            if history is None:
+                history = await self._fetch_history(
+                    message.channel, message
+                )
+            history = history[-5:]
 
             context = "\n".join(
-                f"{msg.author.display_name}: {msg.content}"
+                f"{msg.author_name}: {msg.content}"
                 for msg in history if msg.content.strip()
             )
 
-            response = await self.client.messages.create(
+            response = await self.llm.create(
+                PRIORITY_ENGAGED, 'engagement',
                 model="claude-haiku-4-5-20251001",
                 max_tokens=3,
                 system=(
@@ -237,16 +665,23 @@ class Chat(commands.Cog):
             logger.error(f"Engagement relevance check failed: {e}")
             return False
 
-    def _build_api_messages(self, history):
-        """Convert Discord history into Claude API message format."""
+    def _build_api_messages(self, history, mention_ids=()):
+        """Convert Discord history into Claude API message format.
+        Messages in mention_ids get a hint naming who mentioned the
+        bot."""
         messages_for_api = []
         for msg in history:
-            if msg.author == self.bot.user:
+            if msg.author_id == self.bot.user.id:
                 role = "assistant"
                 content = msg.content
             else:
                 role = "user"
-                content = f"{msg.author.display_name}: {msg.content}"
+                content = f"{msg.author_name}: {msg.content}"
+                if msg.id in mention_ids:
+                    content += (
+                        f"\n[{msg.author_name} @mentioned you directly "
+                        f"- respond to this person.]"
+                    )
 
             if not content.strip():
                 continue
@@ -270,19 +705,38 @@ class Chat(commands.Cog):
     @staticmethod
     def _strip_bot_prefix(text):
         """Remove 'BangaBot:' prefix if Claude includes it."""
-        prefixes = [
-            "BangaBot: ", "BangaBot:",
-            "bangabot: ", "bangabot:",
-        ]
-        for prefix in prefixes:
+        for prefix in BOT_PREFIXES:
             if text.startswith(prefix):
                 return text[len(prefix):].lstrip()
         return text
 
-    async def _react_to_message(self, message):
-        """React with an emoji instead of a full response."""
-        # Gather custom emojis from the guild
+    async def _react_to_message(self, message,
+                                priority=PRIORITY_CHIME_IN):
+        """React with an emoji instead of a full response.
+
+        Picks locally by embedding similarity; the LLM only chooses
+        when no emoji is a close enough match.
+        """
         guild = message.guild
+        channel_name = (
+            getattr(message.channel, 'name', None) or 'DM'
+        )
+        try:
+            emoji, score = await self.emoji_index.pick(
+                guild, message.content
+            )
+        except Exception as e:
+            logger.error(f"Local emoji pick failed: {e}")
+            emoji, score = None, 0.0
+        if emoji is not None:
+            await message.add_reaction(emoji)
+            logger.info(
+                f"Reacted with {emoji} in #{channel_name} "
+                f"(local, score={score:.2f})"
+            )
+            return
+
+        # Gather custom emojis from the guild
         custom_emojis = []
         if guild:
             custom_emojis = [
@@ -312,7 +766,8 @@ class Chat(commands.Cog):
                 "Message: " + message.content
             )
 
-        response = await self.client.messages.create(
+        response = await self.llm.create(
+            priority, 'reaction',
             model="claude-haiku-4-5-20251001",
             max_tokens=20,
             messages=[{"role": "user", "content": prompt}],
@@ -334,9 +789,6 @@ class Chat(commands.Cog):
             emoji = pick
 
         await message.add_reaction(emoji)
-        channel_name = (
-            getattr(message.channel, 'name', None) or 'DM'
-        )
         logger.info(
             f"Reacted with {pick} in #{channel_name}"
         )
@@ -344,9 +796,8 @@ class Chat(commands.Cog):
     @staticmethod
     def _split_response(text):
         """Split a response into natural chat-sized chunks."""
-        import re
         # Split on sentence boundaries (. ! ?) followed by space
-        parts = re.split(r'(?<=[.!?])\s+', text)
+        parts = SENTENCE_BOUNDARY.split(text)
         if len(parts) <= 1:
             return [text]
 
@@ -369,155 +820,294 @@ class Chat(commands.Cog):
         """Estimate token count. Overestimates for safety."""
         return len(text) // 4
 
-    async def _build_system_prompt_with_memories(self, history):
-        """Enrich the system prompt with relevant memories."""
+    async def _build_system_prompt_with_memories(
+        self, history, priority=PRIORITY_CHIME_IN
+    ):
+        """Enrich the system prompt with relevant memories.
+
+        Retrieval runs against the latency budget for the reply's
+        priority; stages that overrun are left out.
+
+        Returns system prompt blocks: the persona, then memories,
+        recent episode context and relationships.
+        """
         db = getattr(self.bot, 'db', None)
         if not db:
-            return SYSTEM_PROMPT
+            return [text_block(SYSTEM_PROMPT)]
+
+        participants = self._participants(history)
+        channel_id = (
+            history[0].channel_id if history else None
+        )
+
+        deadline = memory_manager.RetrievalDeadline(
+            RETRIEVAL_BUDGETS[priority]
+        )
+
+        # Reuse the blocks while the same people keep talking about
+        # the same thing and none of their memories have changed
+        key = await self._block_key(
+            channel_id, participants, history, deadline
+        )
+        blocks = self.block_cache.get(key)
+        if blocks is not None:
+            return blocks
+
+        # Retrieval started speculatively while someone was typing
+        # may already be building these exact blocks
+        spec = self.speculations.get(channel_id)
+        if (spec is not None and spec.key == key
+                and time.monotonic() < spec.expires):
+            # Shielded: a stale reply being cancelled, or this one
+            # running out of time, shouldn't cancel retrieval a
+            # newer reply may still use
+            await memory_manager.timed(
+                {}, 'speculation', asyncio.shield(spec.task),
+                deadline=deadline
+            )
+            blocks = self.block_cache.get(key, record=False)
+            if blocks is not None:
+                self.speculation_hits += 1
+                logger.debug(
+                    f"Using speculative memory blocks in channel "
+                    f"{channel_id}"
+                )
+                return blocks
 
-        # Collect participant user IDs from history
+        return await self._retrieve_blocks(
+            db, key, participants, history, channel_id, deadline
+        )
+
+    @staticmethod
+    def _participants(history):
+        """user_id -> display name of the humans in history."""
         participants = {}
         for msg in history:
-            if msg.author != self.bot.user and not msg.author.bot:
-                participants[str(msg.author.id)] = (
-                    msg.author.display_name
-                )
+            if not msg.is_bot:
+                participants[str(msg.author_id)] = msg.author_name
+        return participants
+
+    async def _block_key(self, channel_id, participants, history,
+                         deadline=None):
+        conv_vec = await memory_manager.timed(
+            {}, 'embed',
+            memory_manager.get_conversation_embedding(history),
+            deadline=deadline
+        )
+        return self.block_cache.key(channel_id, participants, conv_vec)
+
+    async def _retrieve_blocks(self, db, key, participants, history,
+                               channel_id, deadline=None):
+        """Build the memory blocks and cache them under key.
+        Blocks missing tiers because of the deadline aren't
+        cached."""
+        versions = memory_blocks.snapshot(participants)
+        blocks = await self._assemble_memory_blocks(
+            db, participants, history, channel_id, deadline
+        )
+        if deadline is not None and deadline.degraded:
+            self._record_degradation(channel_id, deadline)
+        else:
+            self.block_cache.put(key, versions, blocks)
+        return blocks
+
+    def _record_degradation(self, channel_id, deadline):
+        self.degraded_replies += 1
+        stages = sorted(set(deadline.degraded))
+        for stage in stages:
+            self.degradations[stage] = (
+                self.degradations.get(stage, 0) + 1
+            )
+        logger.warning(
+            f"Retrieval over its {deadline.budget:.1f}s budget in "
+            f"channel {channel_id}; skipped {', '.join(stages)} "
+            f"({self.degraded_replies} degraded replies so far)"
+        )
 
-        channel_id = (
-            history[0].channel.id if history else None
+    def _speculate(self, channel, typist=None):
+        """Start retrieving memory blocks for a reply that may be
+        coming, so retrieval overlaps with the user typing. typist
+        is counted as a participant even if they haven't spoken
+        yet."""
+        db = getattr(self.bot, 'db', None)
+        if not db:
+            return
+        now = time.monotonic()
+        spec = self.speculations.get(channel.id)
+        if (spec is not None and now < spec.expires
+                and typist is not None
+                and (spec.participants is None
+                     or str(typist.id) in spec.participants)):
+            # Still covered; typing events repeat every few seconds
+            return
+        spec = _Speculation(now + SPECULATION_TTL)
+        self.speculations[channel.id] = spec
+        spec.task = asyncio.create_task(
+            self._run_speculation(spec, db, channel, typist)
         )
 
-        # Use memory_manager for token-budgeted retrieval
-        # with vector search
+    async def _run_speculation(self, spec, db, channel, typist):
+        try:
+            history = await self._fetch_history(channel, None)
+            if not history:
+                return
+            participants = self._participants(history)
+            if typist is not None:
+                participants.setdefault(
+                    str(typist.id), typist.display_name
+                )
+            spec.participants = participants
+            spec.key = await self._block_key(
+                channel.id, participants, history
+            )
+            if self.block_cache.get(spec.key, record=False) is None:
+                await self._retrieve_blocks(
+                    db, spec.key, participants, history, channel.id
+                )
+        except Exception as e:
+            logger.error(f"Speculative retrieval failed: {e}")
+
+    async def _assemble_memory_blocks(self, db, participants, history,
+                                      channel_id, deadline=None):
+        """Retrieve memories and build the system prompt blocks."""
+        timings = {}
+        start = time.perf_counter()
         memory_lines, summary_lines = (
             await memory_manager.retrieve_memories(
-                db, participants, history, channel_id
+                db, participants, history, channel_id, timings,
+                deadline
             )
         )
+        logger.debug(
+            f"Prompt assembly took "
+            f"{(time.perf_counter() - start) * 1000:.0f} ms"
+        )
 
-        # Sentiment per participant (sync is fine, fast query)
         sentiment_lines = []
         for uid, name in participants.items():
-            try:
-                row = await asyncio.to_thread(
-                    lambda u=uid: db.query(UserSentiment)
-                    .filter(UserSentiment.user_id == u)
-                    .first()
+            score = self.sentiments.score(uid)
+            if score == 0:
+                continue
+            if score <= -3:
+                attitude = (
+                    "You actively dislike this person. "
+                    "Be dismissive, sarcastic, and don't "
+                    "hide it."
                 )
-                if row and row.score != 0:
-                    score = row.score
-                    if score <= -3:
-                        attitude = (
-                            "You actively dislike this person. "
-                            "Be dismissive, sarcastic, and don't "
-                            "hide it."
-                        )
-                    elif score <= -1:
-                        attitude = (
-                            "You're not a fan of this person. "
-                            "A bit more curt and less patient "
-                            "with them."
-                        )
-                    elif score <= 2:
-                        attitude = (
-                            "You like this person. Warmer, more "
-                            "willing to engage and be friendly."
-                        )
-                    else:
-                        attitude = (
-                            "This is one of your favorites. "
-                            "Genuinely friendly, got their back, "
-                            "still roast them but with love."
-                        )
-                    sentiment_lines.append(
-                        f"- {name}: {attitude}"
-                    )
-            except Exception as e:
-                logger.error(
-                    f"Error fetching sentiment for {uid}: {e}"
+            elif score <= -1:
+                attitude = (
+                    "You're not a fan of this person. "
+                    "A bit more curt and less patient "
+                    "with them."
                 )
+            elif score <= 2:
+                attitude = (
+                    "You like this person. Warmer, more "
+                    "willing to engage and be friendly."
+                )
+            else:
+                attitude = (
+                    "This is one of your favorites. "
+                    "Genuinely friendly, got their back, "
+                    "still roast them but with love."
+                )
+            sentiment_lines.append(
+                f"- {name}: {attitude}"
+            )
 
-        if (not memory_lines and not sentiment_lines
-                and not summary_lines):
-            return SYSTEM_PROMPT
-
-        prompt = SYSTEM_PROMPT
+        blocks = [text_block(SYSTEM_PROMPT)]
 
         if memory_lines:
             memories_block = "\n".join(memory_lines)
-            prompt += (
+            blocks.append(text_block(
                 "\n\n[CORE MEMORIES]\n"
                 "You remember the following from past "
                 "conversations. Use them naturally when relevant "
                 "but never mention having a memory system or "
                 "database:\n"
                 + memories_block
-            )
+            ))
 
         if summary_lines:
             summaries_block = "\n".join(summary_lines)
-            prompt += (
+            blocks.append(text_block(
                 "\n\n[RECENT CONTEXT]\n"
                 + summaries_block
-            )
+            ))
 
         if sentiment_lines:
             sentiment_block = "\n".join(sentiment_lines)
-            prompt += (
+            blocks.append(text_block(
                 "\n\n[RELATIONSHIPS]\n"
                 + sentiment_block
                 + "\n\nEmbody these attitudes naturally through "
                 "your tone and behavior. Never mention scores, "
                 "ratings, or a sentiment system."
-            )
+            ))
 
-        return prompt
+        return blocks
 
-    async def _extract_memories(
-        self, history, bot_response, message
-    ):
-        """Background task: ask Claude if anything is worth
-        remembering from this exchange."""
-        logger.debug("Memory extraction started")
+    def _addresses_bot(self, record):
+        """Whether a message mentions the bot or replies to it."""
+        bot_id = self.bot.user.id
+        if record.reply_to_author_id == bot_id:
+            return True
+        content = record.content
+        if f"<@{bot_id}>" in content or f"<@!{bot_id}>" in content:
+            return True
+        return 'bangabot' in content.lower()
+
+    async def _extract_memories(self, channel_id, records):
+        """Ask Claude if anything in a closed conversation window
+        is worth remembering. Run by the extraction queue."""
+        logger.debug(
+            f"Memory extraction started for channel {channel_id}"
+        )
         try:
             db = getattr(self.bot, 'db', None)
             if not db:
                 logger.warning("Memory extraction skipped - no db")
                 return
 
-            # Build condensed conversation (last 10 + bot reply)
-            recent = history[-10:] if len(history) > 10 else history
             convo_lines = []
+            human_lines = []
             participants = {}
-            for msg in recent:
-                if msg.author != self.bot.user and not msg.author.bot:
-                    participants[str(msg.author.id)] = (
-                        msg.author.display_name
+            directed = False
+            for msg in records:
+                if not msg.content.strip():
+                    continue
+                if msg.author_id == self.bot.user.id:
+                    convo_lines.append(f"BangaBot: {msg.content}")
+                    continue
+                if not msg.is_bot:
+                    participants[str(msg.author_id)] = (
+                        msg.author_name
                     )
+                    human_lines.append(msg.content)
+                    directed = directed or self._addresses_bot(msg)
                 convo_lines.append(
-                    f"{msg.author.display_name}: {msg.content}"
+                    f"{msg.author_name}: {msg.content}"
                 )
-            convo_lines.append(f"BangaBot: {bot_response}")
+            if not participants:
+                return
+
+            # Skip the LLM for windows with nothing memorable
+            should, probability = await self.extraction_gate.check(
+                human_lines, directed
+            )
+            if not should:
+                logger.debug(
+                    f"Extraction gate skipped window in channel "
+                    f"{channel_id} (p={probability:.2f})"
+                )
+                return
             convo_text = "\n".join(convo_lines)
 
             # Ensure every participant has a sentiment row
             for uid, name in participants.items():
                 try:
-                    exists = (
-                        db.query(UserSentiment)
-                        .filter(UserSentiment.user_id == uid)
-                        .first()
-                    )
-                    if not exists:
-                        new_row = UserSentiment(uid, name)
-                        db.add(new_row)
-                        db.commit()
-                        logger.info(
-                            f"Created sentiment row for {name} "
-                            f"(score: 0.0)"
-                        )
+                    await self.sentiments.ensure(uid, name)
                 except Exception as e:
-                    db.rollback()
                     logger.error(
                         f"Error creating sentiment for {uid}: {e}"
                     )
@@ -528,65 +1118,35 @@ class Chat(commands.Cog):
                 for uid, name in participants.items()
             )
 
-            # Fetch existing memories for context
-            existing = []
-            for uid, name in participants.items():
-                try:
-                    rows = (
-                        db.query(UserMemory)
-                        .filter(UserMemory.user_id == uid)
-                        .order_by(UserMemory.updated_at.desc())
-                        .limit(30)
-                        .all()
-                    )
-                    for row in rows:
-                        existing.append(
-                            f"About {name} (id:{uid}): {row.fact}"
-                        )
-                except Exception:
-                    pass
-
-            try:
-                bot_rows = (
-                    db.query(BotMemory)
-                    .order_by(BotMemory.updated_at.desc())
-                    .limit(30)
-                    .all()
-                )
-                for row in bot_rows:
-                    existing.append(
-                        f"Bot [{row.category}]: {row.fact}"
-                    )
-            except Exception:
-                pass
+            # Existing memories most relevant to anything said in
+            # this window, not just its last few lines
+            window_vecs = await memory_manager.embed_window_chunks(
+                human_lines
+            )
+            existing = await memory_manager.select_extraction_context(
+                participants, window_vecs
+            )
 
             existing_text = (
                 "\n".join(existing) if existing
                 else "No existing memories yet."
             )
 
-            # Fetch current sentiment scores for context
+            # Current sentiment scores for context
             sentiment_context_lines = []
             for uid, name in participants.items():
-                try:
-                    srow = (
-                        db.query(UserSentiment)
-                        .filter(UserSentiment.user_id == uid)
-                        .first()
+                entry = self.sentiments.get(uid)
+                if entry is not None:
+                    sentiment_context_lines.append(
+                        f"- {name} (id:{uid}): score "
+                        f"{entry.score}/5, reason: "
+                        f"{entry.reason or 'none yet'}"
+                    )
+                else:
+                    sentiment_context_lines.append(
+                        f"- {name} (id:{uid}): score 0/5 "
+                        f"(no opinion yet)"
                     )
-                    if srow:
-                        sentiment_context_lines.append(
-                            f"- {name} (id:{uid}): score "
-                            f"{srow.score}/5, reason: "
-                            f"{srow.reason or 'none yet'}"
-                        )
-                    else:
-                        sentiment_context_lines.append(
-                            f"- {name} (id:{uid}): score 0/5 "
-                            f"(no opinion yet)"
-                        )
-                except Exception:
-                    pass
 
             sentiment_context = (
                 "\n".join(sentiment_context_lines)
@@ -595,112 +1155,16 @@ class Chat(commands.Cog):
             )
 
             extraction_prompt = (
-                "You are a memory extraction system for a Discord "
-                "bot called BangaBot. Analyze this conversation and "
-                "decide if anything is worth remembering long-term."
-                "\n\nThe DEFAULT response is empty arrays. Most "
-                "conversations — even good ones — have NOTHING "
-                "worth remembering. Only extract facts that would "
-                "still be useful WEEKS from now:\n"
-                "- Personal details someone shared (pets, job, "
-                "location, hobbies, real life events)\n"
-                "- Strong preferences or opinions they'd still "
-                "hold next month\n"
-                "- Inside jokes that actually landed and would "
-                "be funny to reference later\n"
-                "- Corrections to previously known facts\n\n"
-                "Do NOT remember:\n"
-                "- Routine greetings, small talk, or casual "
-                "banter\n"
-                "- Temporary states (\"I'm tired\", moods)\n"
-                "- Game results or ephemeral events\n"
-                "- How the conversation went or interaction "
-                "patterns (\"user said bye three times\", "
-                "\"user tested a feature\")\n"
-                "- Meta-observations about the conversation "
-                "itself\n"
-                "- Anything that just rephrases an existing "
-                "memory\n"
-                "- Anything about BangaBot's own behavior or "
-                "responses\n\n"
-                "Bot memories should be RARE. Only save bot "
-                "memories for genuinely notable server events, "
-                "real inside jokes, or significant group dynamics "
-                "— not routine interactions or conversation "
-                "summaries.\n\n"
-                "SENTIMENT EVALUATION:\n"
-                "Also evaluate whether BangaBot's opinion of each "
-                "participant should shift. The score ranges from "
-                "-5.0 (nemesis) to +5.0 (best friend). Current "
-                "scores are shown below.\n\n"
-                "The default delta is 0. For users you already "
-                "have an opinion of, sentiment should rarely "
-                "change — only when something genuinely notable "
-                "happens. A normal pleasant conversation is NOT "
-                "a reason to shift an established opinion.\n\n"
-                "However, for users at score 0 (no opinion yet), "
-                "be a bit more willing to form an initial "
-                "impression. First impressions matter — if someone "
-                "is being funny, engaging, rude, or annoying in "
-                "their first real interaction, a small delta "
-                "(0.1 to 0.5) is reasonable.\n\n"
-                "Scale guide for delta (max -1.0 to +1.0):\n"
-                "- 0: No change (default for established scores)\n"
-                "- 0.1 to 0.25: Mild impression or slight shift\n"
-                "- 0.25 to 0.5: Notable interaction\n"
-                "- 0.5 to 1.0: Exceptional — truly standout, "
-                "very rare\n\n"
-                "What moves sentiment:\n"
-                "- UP: Being funny, engaging genuinely, sharing "
-                "something personal, being a good hang\n"
-                "- DOWN: Being rude or hostile, reposting "
-                "(bot's pet peeve), being annoying or dismissive\n"
-                "\n"
-                "When in doubt, use 0.\n\n"
-                "PARTICIPANTS:\n" + participant_map + "\n\n"
+                EXTRACTION_PROMPT
+                + "PARTICIPANTS:\n" + participant_map + "\n\n"
                 "CURRENT SENTIMENT:\n" + sentiment_context + "\n\n"
                 "EXISTING MEMORIES:\n" + existing_text + "\n\n"
                 "CONVERSATION:\n" + convo_text + "\n\n"
-                "IMPORTANT: Use the exact Discord ID numbers above "
-                "as user_id values, not display names.\n\n"
-                "Respond with JSON only. If nothing is worth "
-                "remembering and no sentiment changes, respond "
-                "with:\n"
-                "{\"user_memories\": [], \"bot_memories\": [], "
-                "\"sentiment_updates\": []}\n\n"
-                "Otherwise:\n"
-                "{\n"
-                "  \"user_memories\": [\n"
-                "    {\"user_id\": \"<discord_id>\", "
-                "\"user_name\": \"<name>\", "
-                "\"fact\": \"<concise fact>\", "
-                "\"importance\": <1|2|3>, "
-                "\"update_existing\": \"<old fact to replace or "
-                "null>\"}\n"
-                "  ],\n"
-                "  \"bot_memories\": [\n"
-                "    {\"category\": \"<event|joke|relationship"
-                "|self>\", \"fact\": \"<concise fact>\", "
-                "\"importance\": <1|2|3>, "
-                "\"related_user_ids\": \"<comma-sep ids or null>\","
-                " \"update_existing\": \"<old fact to replace or "
-                "null>\"}\n"
-                "  ],\n"
-                "  \"sentiment_updates\": [\n"
-                "    {\"user_id\": \"<discord_id>\", "
-                "\"user_name\": \"<name>\", "
-                "\"delta\": \"<float -1.0 to +1.0>\", "
-                "\"reason\": \"<why the shift>\"}\n"
-                "  ]\n"
-                "}\n\n"
-                "IMPORTANCE LEVELS:\n"
-                "3 = identity-defining (name, job, location, "
-                "family)\n"
-                "2 = notable preference/hobby/opinion (default)\n"
-                "1 = lighter facts, inside jokes, one-off details"
+                + EXTRACTION_FORMAT
             )
 
-            response = await self.client.messages.create(
+            response = await self.llm.create(
+                PRIORITY_BACKGROUND, 'extraction',
                 model="claude-haiku-4-5-20251001",
                 max_tokens=500,
                 system=extraction_prompt,
@@ -712,20 +1176,24 @@ class Chat(commands.Cog):
 
             result_text = response.content[0].text.strip()
             logger.debug(f"Memory extraction response: {result_text[:200]}")
-            await self._process_extraction_result(
-                result_text, participants, message
+            found = await self._process_extraction_result(
+                result_text, participants
             )
+            self.extraction_gate.record_result(probability, found)
 
         except Exception as e:
             logger.error(f"Memory extraction error: {e}", exc_info=True)
 
     async def _process_extraction_result(
-        self, result_text, participants, message
+        self, result_text, participants
     ):
-        """Parse extraction JSON and persist memories."""
+        """Parse extraction JSON and persist memories.
+
+        Returns how many memories and sentiment updates it found.
+        """
         db = getattr(self.bot, 'db', None)
         if not db:
-            return
+            return 0
 
         # Strip markdown code fences if present
         cleaned = result_text.strip()
@@ -739,9 +1207,10 @@ class Chat(commands.Cog):
             data = json.loads(cleaned)
         except json.JSONDecodeError:
             logger.debug("Memory extraction returned non-JSON, skipping")
-            return
+            return 0
 
-        # Process user memories
+        # Collect user memories
+        user_items = []
         for mem in data.get("user_memories", []):
             uid = mem.get("user_id")
             name = mem.get("user_name", "")
@@ -758,126 +1227,13 @@ class Chat(commands.Cog):
             if not uid or not fact:
                 continue
 
-            try:
-                # Check for exact duplicate
-                dup = (
-                    db.query(UserMemory)
-                    .filter(
-                        UserMemory.user_id == uid,
-                        UserMemory.fact == fact
-                    )
-                    .first()
-                )
-                if dup:
-                    continue
-
-                # Similarity-based dedup (Phase 5)
-                similar = (
-                    await memory_manager.find_similar_memories(
-                        db, 'user_memories', fact, uid
-                    )
-                )
-                if similar:
-                    # Merge: update the most similar row
-                    merge_id = similar[0][0]
-                    old = (
-                        db.query(UserMemory)
-                        .filter(UserMemory.id == merge_id)
-                        .first()
-                    )
-                    if old:
-                        old.fact = fact
-                        old.user_name = name
-                        old.importance = max(
-                            importance, old.importance or 2
-                        )
-                        old.updated_at = datetime.utcnow()
-                        old.embedding = None  # re-embed
-                        db.commit()
-                        logger.info(
-                            f"Merged similar memory for "
-                            f"{name}: {fact} "
-                            f"(sim={similar[0][1]:.2f})"
-                        )
-                        asyncio.create_task(
-                            memory_manager
-                            .store_embedding_for_memory(
-                                db, old, 'user_memories'
-                            )
-                        )
-                        continue
-
-                # Exact-match update_existing fallback
-                if update:
-                    old = (
-                        db.query(UserMemory)
-                        .filter(
-                            UserMemory.user_id == uid,
-                            UserMemory.fact == update
-                        )
-                        .first()
-                    )
-                    if old:
-                        old.fact = fact
-                        old.user_name = name
-                        old.importance = importance
-                        old.updated_at = datetime.utcnow()
-                        old.embedding = None
-                        db.commit()
-                        logger.info(
-                            f"Updated memory for {name}: "
-                            f"{fact} (importance: {importance})"
-                        )
-                        asyncio.create_task(
-                            memory_manager
-                            .store_embedding_for_memory(
-                                db, old, 'user_memories'
-                            )
-                        )
-                        continue
-
-                # Enforce cap: 500 per user
-                count = (
-                    db.query(UserMemory)
-                    .filter(UserMemory.user_id == uid)
-                    .count()
-                )
-                if count >= 500:
-                    # Evict lowest importance, oldest first
-                    oldest = (
-                        db.query(UserMemory)
-                        .filter(UserMemory.user_id == uid)
-                        .order_by(
-                            UserMemory.importance.asc(),
-                            UserMemory.updated_at.asc()
-                        )
-                        .first()
-                    )
-                    if oldest:
-                        db.delete(oldest)
-
-                new_mem = UserMemory(
-                    uid, name, fact, importance
-                )
-                db.add(new_mem)
-                db.commit()
-                logger.info(
-                    f"New memory for {name}: {fact} "
-                    f"(importance: {importance})"
-                )
-                # Embed in background
-                asyncio.create_task(
-                    memory_manager.store_embedding_for_memory(
-                        db, new_mem, 'user_memories'
-                    )
-                )
-            except Exception as e:
-                db.rollback()
-                logger.error(
-                    f"Error saving user memory: {e}"
-                )
+            user_items.append({
+                "uid": uid, "name": name, "fact": fact,
+                "update": update, "importance": importance,
+            })
 
-        # Process bot memories
+        # Collect bot memories
+        bot_items = []
         for mem in data.get("bot_memories", []):
             category = mem.get("category", "event")
             fact = mem.get("fact", "").strip()
@@ -893,114 +1249,15 @@ class Chat(commands.Cog):
             if not fact:
                 continue
 
-            try:
-                # Check for exact duplicate
-                dup = (
-                    db.query(BotMemory)
-                    .filter(BotMemory.fact == fact)
-                    .first()
-                )
-                if dup:
-                    continue
-
-                # Similarity-based dedup (Phase 5)
-                similar = (
-                    await memory_manager.find_similar_memories(
-                        db, 'bot_memories', fact
-                    )
-                )
-                if similar:
-                    merge_id = similar[0][0]
-                    old = (
-                        db.query(BotMemory)
-                        .filter(BotMemory.id == merge_id)
-                        .first()
-                    )
-                    if old:
-                        old.fact = fact
-                        old.category = category
-                        old.related_user_ids = related
-                        old.importance = max(
-                            importance, old.importance or 2
-                        )
-                        old.updated_at = datetime.utcnow()
-                        old.embedding = None
-                        db.commit()
-                        logger.info(
-                            f"Merged similar bot memory: "
-                            f"{fact} "
-                            f"(sim={similar[0][1]:.2f})"
-                        )
-                        asyncio.create_task(
-                            memory_manager
-                            .store_embedding_for_memory(
-                                db, old, 'bot_memories'
-                            )
-                        )
-                        continue
-
-                # Exact-match update_existing fallback
-                if update:
-                    old = (
-                        db.query(BotMemory)
-                        .filter(BotMemory.fact == update)
-                        .first()
-                    )
-                    if old:
-                        old.fact = fact
-                        old.category = category
-                        old.related_user_ids = related
-                        old.importance = importance
-                        old.updated_at = datetime.utcnow()
-                        old.embedding = None
-                        db.commit()
-                        logger.info(
-                            f"Updated bot memory: {fact} "
-                            f"(importance: {importance})"
-                        )
-                        asyncio.create_task(
-                            memory_manager
-                            .store_embedding_for_memory(
-                                db, old, 'bot_memories'
-                            )
-                        )
-                        continue
-
-                # Enforce cap: 1000 bot memories
-                count = db.query(BotMemory).count()
-                if count >= 1000:
-                    # Evict lowest importance, oldest first
-                    oldest = (
-                        db.query(BotMemory)
-                        .order_by(
-                            BotMemory.importance.asc(),
-                            BotMemory.updated_at.asc()
-                        )
-                        .first()
-                    )
-                    if oldest:
-                        db.delete(oldest)
+            bot_items.append({
+                "category": category, "fact": fact,
+                "related": related, "update": update,
+                "importance": importance,
+            })
 
-                new_mem = BotMemory(
-                    category, fact, related, importance
-                )
-                db.add(new_mem)
-                db.commit()
-                logger.info(
-                    f"New bot memory [{category}]: {fact} "
-                    f"(importance: {importance})"
-                )
-                # Embed in background
-                asyncio.create_task(
-                    memory_manager.store_embedding_for_memory(
-                        db, new_mem, 'bot_memories'
-                    )
-                )
-            except Exception as e:
-                db.rollback()
-                logger.error(
-                    f"Error saving bot memory: {e}"
-                )
+        if user_items or bot_items:
+            await self._save_memories(db, user_items, bot_items)
+        found = len(user_items) + len(bot_items)
 
         # Process sentiment updates
         for update in data.get("sentiment_updates", []):
@@ -1020,107 +1277,471 @@ class Chat(commands.Cog):
             delta = max(-1.0, min(1.0, delta))
             if delta == 0:
                 continue
+            found += 1
 
             try:
-                row = (
-                    db.query(UserSentiment)
-                    .filter(UserSentiment.user_id == uid)
-                    .first()
+                old_score, new_score = await self.sentiments.apply_delta(
+                    str(uid), name, delta, reason
+                )
+                logger.info(
+                    f"Sentiment for {name}: "
+                    f"{old_score} -> {new_score} "
+                    f"({reason})"
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error saving sentiment for {uid}: {e}"
                 )
-                if row:
-                    old_score = row.score
-                    new_score = round(
-                        max(-5.0, min(5.0, old_score + delta)),
-                        2
+
+        return found
+
+    @staticmethod
+    def _resolve_shared_targets(plans):
+        """Let only one fact rewrite each existing row.
+
+        Distinct facts in a batch can match the same stored memory.
+        An exact update target wins over a similarity merge, and
+        among merges the most similar fact wins; the others are
+        inserted as memories of their own.
+        """
+        best = {}
+        for i, (_item, action) in enumerate(plans):
+            if action[0] == 'insert':
+                continue
+            rank = (1, 0.0) if action[0] == 'update' else (0, action[2])
+            current = best.get(action[1])
+            if current is None or rank > current[0]:
+                best[action[1]] = (rank, i)
+        winners = {i for _rank, i in best.values()}
+        for i, (item, action) in enumerate(plans):
+            if action[0] != 'insert' and i not in winners:
+                logger.info(
+                    f"Memory row {action[1]} already taken in this "
+                    f"batch; inserting separately: {item['fact']}"
+                )
+                plans[i] = (item, ('insert',))
+
+    async def _save_memories(self, db, user_items, bot_items):
+        """Dedup and persist extracted memories in one pass.
+
+        Embeds every fact in one batch and drops repeats within the
+        batch, looks up exact duplicates, near-duplicates and update
+        targets for the rest in one query, then applies merges,
+        updates, evictions and inserts in a single transaction.
+        """
+        items = user_items + bot_items
+        vecs = await memory_manager.embed_texts(
+            [item["fact"] for item in items]
+        )
+        for item, vec in zip(items, vecs or [None] * len(items)):
+            item["vec"] = vec
+        user_items = memory_manager.dedup_within_batch(
+            user_items, scope="uid"
+        )
+        bot_items = memory_manager.dedup_within_batch(bot_items)
+
+        try:
+            lookup = await memory_manager.find_duplicates_batch(
+                user_items, bot_items
+            )
+        except Exception as e:
+            logger.error(f"Memory dedup lookup failed: {e}")
+            return
+
+        # Decide what happens to each fact before touching rows:
+        # ('merge', row_id, sim), ('update', row_id) or ('insert',)
+        plans = {'user': [], 'bot': []}
+        for kind, kind_items in [('user', user_items),
+                                 ('bot', bot_items)]:
+            for i, item in enumerate(kind_items):
+                info = lookup[kind].get(i)
+                if info is None or info['dup']:
+                    continue
+                # Without a vector there is nothing to compare, so
+                # the fact can only update or be inserted
+                if info['similar'] and item["vec"] is not None:
+                    plans[kind].append(
+                        (item, ('merge',) + tuple(info['similar']))
                     )
-                    row.score = new_score
-                    row.reason = reason
-                    row.user_name = name
-                    row.updated_at = datetime.utcnow()
-                    db.commit()
-                    logger.info(
-                        f"Sentiment for {name}: "
-                        f"{old_score} -> {new_score} "
-                        f"({reason})"
+                elif info['update_id']:
+                    plans[kind].append(
+                        (item, ('update', info['update_id']))
                     )
                 else:
-                    new_score = round(
-                        max(-5.0, min(5.0, delta)), 2
+                    plans[kind].append((item, ('insert',)))
+            self._resolve_shared_targets(plans[kind])
+
+        if not plans['user'] and not plans['bot']:
+            return
+
+        try:
+            target_ids = {
+                kind: {
+                    action[1] for _item, action in plans[kind]
+                    if action[0] != 'insert'
+                }
+                for kind in plans
+            }
+            rows = {
+                'user': {
+                    row.id: row for row in (
+                        db.query(UserMemory)
+                        .filter(UserMemory.id.in_(target_ids['user']))
+                        .all()
                     )
-                    new_row = UserSentiment(
-                        uid, name, new_score, reason
+                } if target_ids['user'] else {},
+                'bot': {
+                    row.id: row for row in (
+                        db.query(BotMemory)
+                        .filter(BotMemory.id.in_(target_ids['bot']))
+                        .all()
                     )
-                    db.add(new_row)
-                    db.commit()
-                    logger.info(
-                        f"Sentiment for {name}: "
-                        f"0 -> {new_score} "
-                        f"({reason})"
+                } if target_ids['bot'] else {},
+            }
+
+            # Enforce caps: 500 per user, 1000 bot memories.
+            # Evict lowest importance, oldest first.
+            new_per_user = {}
+            for item, action in plans['user']:
+                if action[0] == 'insert':
+                    new_per_user[item["uid"]] = (
+                        new_per_user.get(item["uid"], 0) + 1
                     )
-            except Exception as e:
-                db.rollback()
-                logger.error(
-                    f"Error saving sentiment for {uid}: {e}"
+            for uid, added in new_per_user.items():
+                info = next(
+                    lookup['user'][i]
+                    for i, item in enumerate(user_items)
+                    if item["uid"] == uid
                 )
+                overflow = min(added, info['total'] + added - 500)
+                if overflow > 0:
+                    for oldest in (
+                        db.query(UserMemory)
+                        .filter(
+                            UserMemory.user_id == uid,
+                            ~UserMemory.id.in_(target_ids['user'])
+                        )
+                        .order_by(
+                            UserMemory.importance.asc(),
+                            UserMemory.updated_at.asc()
+                        )
+                        .limit(overflow)
+                        .all()
+                    ):
+                        db.delete(oldest)
 
-    def _track_episode_message(self, message, is_bot=False):
-        """Track a message for episodic summarization."""
-        channel_id = message.channel.id
-        now = time.time()
+            new_bot = sum(
+                1 for _item, action in plans['bot']
+                if action[0] == 'insert'
+            )
+            if new_bot:
+                total = next(iter(lookup['bot'].values()))['total']
+                overflow = min(new_bot, total + new_bot - 1000)
+                if overflow > 0:
+                    for oldest in (
+                        db.query(BotMemory)
+                        .filter(~BotMemory.id.in_(target_ids['bot']))
+                        .order_by(
+                            BotMemory.importance.asc(),
+                            BotMemory.updated_at.asc()
+                        )
+                        .limit(overflow)
+                        .all()
+                    ):
+                        db.delete(oldest)
+
+            log_lines = []
+            for item, action in plans['user']:
+                uid, name = item["uid"], item["name"]
+                fact, importance = item["fact"], item["importance"]
+                old = rows['user'].get(action[1]) if (
+                    action[0] != 'insert'
+                ) else None
+                if old:
+                    old.fact = fact
+                    old.user_name = name
+                    if action[0] == 'merge':
+                        old.importance = max(
+                            importance, old.importance or 2
+                        )
+                        log_lines.append(
+                            f"Merged similar memory for "
+                            f"{name}: {fact} (sim={action[2]:.2f})"
+                        )
+                    else:
+                        old.importance = importance
+                        log_lines.append(
+                            f"Updated memory for {name}: "
+                            f"{fact} (importance: {importance})"
+                        )
+                    old.updated_at = datetime.utcnow()
+                    # Keep the old vector rather than dropping the
+                    # row out of semantic search
+                    if item["vec"] is not None:
+                        old.embedding = item["vec"]
+                    continue
+                new_mem = UserMemory(uid, name, fact, importance)
+                new_mem.embedding = item["vec"]
+                db.add(new_mem)
+                log_lines.append(
+                    f"New memory for {name}: {fact} "
+                    f"(importance: {importance})"
+                )
+
+            for item, action in plans['bot']:
+                fact, importance = item["fact"], item["importance"]
+                category = item["category"]
+                old = rows['bot'].get(action[1]) if (
+                    action[0] != 'insert'
+                ) else None
+                if old:
+                    old.fact = fact
+                    old.category = category
+                    old.related_user_ids = item["related"]
+                    if action[0] == 'merge':
+                        old.importance = max(
+                            importance, old.importance or 2
+                        )
+                        log_lines.append(
+                            f"Merged similar bot memory: {fact} "
+                            f"(sim={action[2]:.2f})"
+                        )
+                    else:
+                        old.importance = importance
+                        log_lines.append(
+                            f"Updated bot memory: {fact} "
+                            f"(importance: {importance})"
+                        )
+                    old.updated_at = datetime.utcnow()
+                    # Keep the old vector rather than dropping the
+                    # row out of semantic search
+                    if item["vec"] is not None:
+                        old.embedding = item["vec"]
+                    continue
+                new_mem = BotMemory(
+                    category, fact, item["related"], importance
+                )
+                new_mem.embedding = item["vec"]
+                db.add(new_mem)
+                log_lines.append(
+                    f"New bot memory [{category}]: {fact} "
+                    f"(importance: {importance})"
+                )
 
-        # Initialize episode tracking for this channel
-        if channel_id not in self.channel_episodes:
-            self.channel_episodes[channel_id] = []
-            self.channel_msg_counts[channel_id] = 0
+            db.commit()
+            for uid in {item["uid"] for item, _action in plans['user']}:
+                memory_blocks.bump_user(uid)
+            if plans['bot']:
+                memory_blocks.bump_global()
+            for line in log_lines:
+                logger.info(line)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error saving memories: {e}")
 
-        episode = self.channel_episodes[channel_id]
+    def _track_episode_message(self, message, is_bot=False):
+        """Track a message for episodic summarization. Called for
+        every message, so this only appends to memory; all the
+        expensive work happens when the episode is summarized."""
+        channel_id = message.channel.id
 
-        # Check gap trigger: if last message was >30 min ago,
-        # finalize the previous episode
-        if (episode and
-                now - episode[-1].get('time', 0)
-                > EPISODE_GAP_SECONDS):
-            self._trigger_episode_summary(channel_id)
+        # A channel quiet for longer than the gap has already had
+        # its previous episode expire and summarized
+        episode = self.channel_episodes.get(channel_id)
+        if episode is None:
+            episode = deque(maxlen=EPISODE_VOLUME_THRESHOLD)
+            self.channel_episodes[channel_id] = episode
+        else:
+            self.channel_episodes.touch(channel_id)
 
-        # Add current message
-        episode.append({
-            'author': message.author.display_name,
-            'author_id': str(message.author.id),
-            'content': message.content,
-            'is_bot': is_bot,
-            'timestamp': message.created_at,
-            'time': now,
-        })
-        self.channel_msg_counts[channel_id] = (
-            self.channel_msg_counts.get(channel_id, 0) + 1
+        record = EpisodeMessage(
+            message.id, message.author.display_name,
+            str(message.author.id), message.content, is_bot,
+            message.created_at,
         )
+        episode.append(record)
+        self.episode_log.append(channel_id, record)
 
         # Volume trigger: every 50 messages
-        if (self.channel_msg_counts[channel_id]
-                >= EPISODE_VOLUME_THRESHOLD):
+        if len(episode) >= EPISODE_VOLUME_THRESHOLD:
             self._trigger_episode_summary(channel_id)
 
     def _trigger_episode_summary(self, channel_id):
         """Trigger summarization of the current episode buffer."""
-        episode = self.channel_episodes.get(channel_id, [])
-        self.channel_episodes[channel_id] = []
-        self.channel_msg_counts[channel_id] = 0
+        episode = self.channel_episodes.pop(channel_id)
+        if episode is not None:
+            self._summarize_episode(channel_id, episode)
+
+    async def _restore_episodes(self):
+        """Pick up episodes buffered before the last restart. Ones
+        that have gone quiet since are summarized now; the rest carry
+        on, with a fresh gap."""
+        restored = await self.episode_log.load()
+        now = datetime.now(timezone.utc)
+        finished = 0
+        for channel_id, messages in restored.items():
+            # A log holding more than one episode's worth (the volume
+            # trigger fired but its rows weren't cleared yet) is
+            # summarized in full episodes, the way the trigger would
+            # have, rather than truncated into the deque
+            while len(messages) >= EPISODE_VOLUME_THRESHOLD:
+                self._summarize_episode(
+                    channel_id, messages[:EPISODE_VOLUME_THRESHOLD]
+                )
+                messages = messages[EPISODE_VOLUME_THRESHOLD:]
+                finished += 1
+            if not messages:
+                continue
+            last = messages[-1].timestamp
+            if last is not None and last.tzinfo is None:
+                last = last.replace(tzinfo=timezone.utc)
+            if (last is None or (now - last).total_seconds()
+                    > EPISODE_GAP_SECONDS):
+                self._summarize_episode(channel_id, messages)
+                finished += 1
+            else:
+                self.channel_episodes[channel_id] = deque(
+                    messages, maxlen=EPISODE_VOLUME_THRESHOLD
+                )
+        if restored:
+            logger.info(
+                f"Restored {len(self.channel_episodes)} episode(s), "
+                f"summarized {finished} that were already complete"
+            )
 
+    def _summarize_episode(self, channel_id, episode):
+        if episode:
+            self.episode_log.clear(channel_id, episode[-1].id)
         if len(episode) < EPISODE_MIN_MESSAGES:
             return
 
         db = getattr(self.bot, 'db', None)
-        if not db or not self.client:
+        if not db or not self.llm:
             return
 
         asyncio.create_task(
-            memory_manager.summarize_episode(
-                self.client, episode, channel_id, db
+            self._run_episode_summary(channel_id, list(episode), db)
+        )
+
+    async def _run_episode_summary(self, channel_id, episode, db):
+        async with self._summary_slots:
+            await memory_manager.summarize_episode(
+                self.llm, episode, channel_id, db
             )
+
+    async def _complete_reply(self, message, system_prompt,
+                              messages_for_api, priority):
+        """Generate the whole reply, then send it in chunks with
+        typing delays. Returns the reply text; a [REACT] reply is
+        returned without sending anything."""
+        response = await self.llm.create(
+            priority, 'reply',
+            model="claude-haiku-4-5-20251001",
+            max_tokens=300,
+            system=system_prompt,
+            messages=messages_for_api,
+        )
+        reply_text = self._strip_bot_prefix(
+            response.content[0].text
         )
+        if not reply_text or reply_text.strip() == REACT_SENTINEL:
+            return reply_text
+
+        self.replies.mark_sending(message.channel.id)
+        chunks = self._split_response(reply_text)
+        for i, chunk in enumerate(chunks):
+            # Show typing, pause, send
+            async with message.channel.typing():
+                delay = random.uniform(0.8, 2.5)
+                if i > 0:
+                    delay = random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+            await message.channel.send(chunk)
+        return reply_text
+
+    async def _stream_reply(self, message, system_prompt,
+                            messages_for_api, priority):
+        """Stream the reply, sending each chunk as soon as its
+        sentence is complete while the typing indicator runs.
+
+        Returns the reply text; a [REACT] reply is returned without
+        sending anything.
+        """
+        full = ""
+        started = False  # bot prefix stripped, [REACT] ruled out
+        pending = ""     # text after the last sentence boundary
+        current = ""     # complete sentences not yet sent
+        last_sent = None
+
+        async def send(chunk):
+            nonlocal last_sent
+            if last_sent is not None:
+                # Keep a human-ish gap between consecutive chunks
+                gap = random.uniform(0.5, 1.5)
+                wait = gap - (time.monotonic() - last_sent)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            else:
+                self.replies.mark_sending(message.channel.id)
+            await message.channel.send(chunk)
+            last_sent = time.monotonic()
+
+        async with message.channel.typing():
+            async with self.llm.stream(
+                priority, 'reply',
+                model="claude-haiku-4-5-20251001",
+                max_tokens=300,
+                system=system_prompt,
+                messages=messages_for_api,
+            ) as stream:
+                async for delta in stream.text_stream:
+                    full += delta
+                    if not started:
+                        head = full.lstrip()
+                        # Wait while the text could still become a
+                        # bot prefix or the [REACT] sentinel
+                        if any(
+                            candidate.startswith(head)
+                            for candidate in
+                            BOT_PREFIXES + [REACT_SENTINEL]
+                        ) or head.startswith(REACT_SENTINEL):
+                            continue
+                        started = True
+                        delta = self._strip_bot_prefix(head)
+
+                    pending += delta
+                    parts = SENTENCE_BOUNDARY.split(pending)
+                    pending = parts.pop()
+                    for sentence in parts:
+                        current = (
+                            f"{current} {sentence}" if current
+                            else sentence
+                        )
+                        # Coin flip to group short sentences so it
+                        # doesn't feel like a telegram
+                        if (random.random() < 0.4
+                                and len(current) < 120):
+                            continue
+                        await send(current)
+                        current = ""
+
+            if not started:
+                # Whole reply was a prefix or exactly [REACT]
+                reply_text = self._strip_bot_prefix(full.strip())
+                if reply_text.strip() == REACT_SENTINEL:
+                    return reply_text
+                pending = reply_text
+
+            tail = " ".join(
+                part for part in (current, pending.strip()) if part
+            )
+            if tail:
+                await send(tail)
+
+        return self._strip_bot_prefix(full.strip())
 
     async def _generate_response(
-        self, message, mentioned, engaged=False
+        self, message, mention_ids, engaged=False
     ):
         # One-time embedding backfill on first response
         if not self._backfill_done:
@@ -1131,76 +1752,61 @@ class Chat(commands.Cog):
                     memory_manager.backfill_embeddings(db)
                 )
 
+        mentioned = bool(mention_ids)
         history = await self._fetch_history(message.channel, message)
-        messages_for_api = self._build_api_messages(history)
+        messages_for_api = self._build_api_messages(history, mention_ids)
 
         if not messages_for_api:
             return
 
-        if mentioned:
+        if mentioned and not any(
+                record.id in mention_ids for record in history):
+            # The mentioning message fell out of the window
             messages_for_api[-1]["content"] += (
                 "\n[You were @mentioned directly - respond to "
                 "this person.]"
             )
 
-        # Track incoming message for episode detection
-        self._track_episode_message(message, is_bot=False)
+        if mentioned:
+            priority = PRIORITY_MENTION
+        elif engaged:
+            priority = PRIORITY_ENGAGED
+        else:
+            priority = PRIORITY_CHIME_IN
 
         system_prompt = (
             await self._build_system_prompt_with_memories(
-                history
+                history, priority
             )
         )
 
         try:
-            response = await self.client.messages.create(
-                model="claude-haiku-4-5-20251001",
-                max_tokens=300,
-                system=system_prompt,
-                messages=messages_for_api,
-            )
-            reply_text = self._strip_bot_prefix(
-                response.content[0].text
-            )
+            if STREAM_RESPONSES:
+                reply_text = await self._stream_reply(
+                    message, system_prompt, messages_for_api,
+                    priority
+                )
+            else:
+                reply_text = await self._complete_reply(
+                    message, system_prompt, messages_for_api,
+                    priority
+                )
             if not reply_text:
                 return
 
             # Bot chose to react instead of respond
-            if reply_text.strip() == "[REACT]":
+            if reply_text.strip() == REACT_SENTINEL:
+                self.replies.mark_sending(message.channel.id)
                 try:
-                    await self._react_to_message(message)
+                    await self._react_to_message(message, priority)
                 except Exception as e:
                     logger.error(f"Reaction error: {e}")
                 return
 
-            chunks = self._split_response(reply_text)
-            for i, chunk in enumerate(chunks):
-                # Show typing, pause, send
-                async with message.channel.typing():
-                    delay = random.uniform(0.8, 2.5)
-                    if i > 0:
-                        delay = random.uniform(0.5, 1.5)
-                    await asyncio.sleep(delay)
-                await message.channel.send(chunk)
-
             self.engaged_channels[message.channel.id] = (
                 time.time()
             )
 
-            # Track bot response for episode detection
-            bot_msg_proxy = type('Msg', (), {
-                'channel': message.channel,
-                'author': type('Author', (), {
-                    'display_name': 'BangaBot',
-                    'id': self.bot.user.id,
-                })(),
-                'content': reply_text,
-                'created_at': datetime.utcnow(),
-            })()
-            self._track_episode_message(
-                bot_msg_proxy, is_bot=True
-            )
-
             channel_name = (
                 getattr(message.channel, 'name', None)
                 or 'DM'
@@ -1211,11 +1817,9 @@ class Chat(commands.Cog):
                 f"(mentioned={mentioned}, "
                 f"engaged={engaged})"
             )
-            asyncio.create_task(
-                self._extract_memories(
-                    history, reply_text, message
-                )
-            )
+            # Queue for windowed extraction; the reply itself is
+            # picked up from the buffer when the window closes
+            self.extraction_queue.add(message.channel.id, history)
         except Exception as e:
             logger.error(f"Anthropic API error: {e}")
 
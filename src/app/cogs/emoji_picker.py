@@ -0,0 +1,142 @@
+"""
+Local emoji reaction picker.
+
+Keeps a per-guild index of custom emoji name embeddings, plus a small
+Unicode emoji vocabulary, and picks a reaction by nearest neighbour
+against the message embedding. Guild indexes are built on first use
+and rebuilt when the guild's emojis change.
+"""
+import re
+import logging
+
+from cogs import memory_manager
+
+logger = logging.getLogger('bangabot')
+
+# Cosine similarity a pick needs; below it the caller asks the LLM
+MATCH_THRESHOLD = 0.35
+# Small nudge so a fitting custom emoji beats a generic Unicode one
+CUSTOM_BONUS = 0.05
+
+UNICODE_EMOJIS = {
+    "😂": "laughing crying, funny, lol, hilarious joke",
+    "💀": "skull, dead, dying of laughter, I can't",
+    "😭": "sobbing, crying, sad, so bad it hurts",
+    "🔥": "fire, hot, lit, awesome, amazing",
+    "👀": "eyes, looking, suspicious, drama, interesting",
+    "🤔": "thinking, hmm, doubtful, question",
+    "👍": "thumbs up, okay, sounds good, agree",
+    "👎": "thumbs down, disagree, bad, no",
+    "❤️": "heart, love, wholesome, sweet",
+    "🎉": "party, celebrate, congratulations, birthday",
+    "😬": "grimace, awkward, yikes, cringe",
+    "🙄": "eye roll, annoyed, whatever, sure buddy",
+    "😎": "cool, sunglasses, smooth, confident",
+    "🤡": "clown, foolish, ridiculous, embarrassing",
+    "😴": "sleepy, tired, boring, going to bed",
+    "🍕": "pizza, food, hungry, dinner",
+    "🍺": "beer, drinks, bar, cheers",
+    "🎮": "video games, gaming, playing, controller",
+    "🏆": "trophy, win, champion, victory",
+    "💪": "strong, workout, gym, you got this",
+    "🫡": "salute, respect, yes sir, on it",
+    "😤": "huffing, angry, frustrated, determined",
+    "🤝": "handshake, deal, agreement, teamwork",
+    "🧠": "brain, smart, big brain, genius idea",
+    "😳": "flushed, embarrassed, shocked, surprised",
+    "🐐": "goat, greatest of all time, legend",
+}
+
+
+def _describe(name):
+    """Turn an emoji name like 'danaThumbsUp_2' into words."""
+    words = re.sub(r'([a-z])([A-Z])', r'\1 \2', name)
+    words = re.sub(r'[_\-\d]+', ' ', words)
+    return words.strip().lower() or name
+
+
+class EmojiIndex:
+    """Per-guild custom emoji embeddings plus Unicode fallbacks."""
+
+    def __init__(self):
+        self._guilds = {}  # guild_id -> (emoji ids, matrix)
+        self._unicode = None  # (emoji strings, matrix)
+
+    @staticmethod
+    async def _embed_matrix(descriptions):
+        import numpy as np
+
+        vecs = await memory_manager.embed_texts(descriptions)
+        if not vecs:
+            return None
+        return np.array(vecs, dtype=np.float32)
+
+    async def _unicode_index(self):
+        if self._unicode is None:
+            emojis = list(UNICODE_EMOJIS)
+            matrix = await self._embed_matrix(
+                [UNICODE_EMOJIS[e] for e in emojis]
+            )
+            if matrix is None:
+                return None
+            self._unicode = (emojis, matrix)
+        return self._unicode
+
+    async def _guild_index(self, guild):
+        if guild.id not in self._guilds:
+            emojis = [e for e in guild.emojis if e.available]
+            matrix = None
+            if emojis:
+                matrix = await self._embed_matrix(
+                    [_describe(e.name) for e in emojis]
+                )
+            self._guilds[guild.id] = (
+                [e.id for e in emojis], matrix
+            )
+            logger.debug(
+                f"Indexed {len(emojis)} custom emojis for "
+                f"{guild.name}"
+            )
+        return self._guilds[guild.id]
+
+    def invalidate(self, guild_id):
+        """Drop a guild's index; it is rebuilt on next use."""
+        self._guilds.pop(guild_id, None)
+
+    async def pick(self, guild, text_str):
+        """Best reaction for text_str.
+
+        Returns (emoji, score), where emoji is a guild Emoji or a
+        Unicode string, or (None, best_score) if nothing scores
+        above MATCH_THRESHOLD.
+        """
+        if not text_str.strip():
+            return None, 0.0
+        import numpy as np
+
+        query = await memory_manager.embed_text(text_str)
+        if query is None:
+            return None, 0.0
+        query = np.array(query, dtype=np.float32)
+
+        best, best_score = None, -1.0
+        if guild is not None:
+            ids, matrix = await self._guild_index(guild)
+            if matrix is not None:
+                scores = matrix @ query + CUSTOM_BONUS
+                i = int(scores.argmax())
+                emoji = guild.get_emoji(ids[i])
+                if emoji is not None and emoji.available:
+                    best, best_score = emoji, float(scores[i])
+
+        unicode_index = await self._unicode_index()
+        if unicode_index is not None:
+            emojis, matrix = unicode_index
+            scores = matrix @ query
+            i = int(scores.argmax())
+            if float(scores[i]) > best_score:
+                best, best_score = emojis[i], float(scores[i])
+
+        if best_score < MATCH_THRESHOLD:
+            return None, best_score
+        return best, best_score
@@ -0,0 +1,195 @@
+"""
+Local engagement classifier for engaged channels.
+
+Scores whether a message is meant for the bot from cheap features
+(addressed by name, reply to the bot, question marks, time since the
+bot spoke) plus MiniLM similarity to the bot's last message. Only
+uncertain scores are escalated to the LLM YES/NO check.
+
+Set ENGAGEMENT_LOG_PATH to append every decision (features, score,
+and the LLM's answer when escalated) as JSON lines; that file is the
+labelled replay input for eval_engagement.py. With
+ENGAGEMENT_SHADOW=true every message is still sent to the LLM, so the
+log holds an unbiased labelled sample of all decisions.
+"""
+import os
+import re
+import json
+import math
+import logging
+
+logger = logging.getLogger('bangabot')
+
+# Scores at or above ENGAGE respond, at or below SKIP ignore,
+# anything in between goes to the LLM
+ENGAGE_THRESHOLD = 0.8
+SKIP_THRESHOLD = 0.2
+
+# Logistic weights over the features below. Hand-set; check them
+# against a labelled replay with eval_engagement.py before changing.
+WEIGHTS = {
+    'bias': -1.0,
+    'addressed': 3.0,
+    'reply_to_bot': 4.0,
+    'reply_to_other': -3.0,
+    'mentions_other': -2.0,
+    'question': 0.8,
+    'second_person': 0.8,
+    'recency': 1.0,
+    'similarity': 2.5,
+    'humans_since_bot': -0.7,
+}
+
+ENGAGEMENT_LOG_PATH = os.getenv('ENGAGEMENT_LOG_PATH')
+ENGAGEMENT_SHADOW = (
+    os.getenv('ENGAGEMENT_SHADOW', 'false').lower() == 'true'
+)
+STATS_LOG_EVERY = 50
+
+_NAME_PATTERN = re.compile(r'\bbanga(bot)?\b', re.IGNORECASE)
+_SECOND_PERSON = re.compile(r"\b(you|your|you're|u|ur)\b", re.IGNORECASE)
+
+
+def extract_features(content, addressed=None, reply_to_bot=False,
+                     reply_to_other=False, mentions_other=False,
+                     seconds_since_bot=None, window_seconds=120,
+                     similarity=0.0, humans_since_bot=0):
+    """Feature dict for one message. All values are in [0, 1]."""
+    if addressed is None:
+        addressed = bool(_NAME_PATTERN.search(content))
+    if seconds_since_bot is None:
+        recency = 0.0
+    else:
+        recency = max(0.0, 1.0 - seconds_since_bot / window_seconds)
+    return {
+        'addressed': float(addressed),
+        'reply_to_bot': float(reply_to_bot),
+        'reply_to_other': float(reply_to_other),
+        'mentions_other': float(mentions_other),
+        'question': float('?' in content),
+        'second_person': float(bool(_SECOND_PERSON.search(content))),
+        'recency': recency,
+        'similarity': max(0.0, min(1.0, similarity)),
+        'humans_since_bot': min(1.0, humans_since_bot / 3),
+    }
+
+
+def score(features, weights=None):
+    """Probability that the message is directed at the bot."""
+    weights = weights or WEIGHTS
+    z = weights['bias'] + sum(
+        weights[name] * value for name, value in features.items()
+    )
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def decide(probability):
+    """True (respond), False (ignore) or None (ask the LLM)."""
+    if probability >= ENGAGE_THRESHOLD:
+        return True
+    if probability <= SKIP_THRESHOLD:
+        return False
+    return None
+
+
+class EngagementClassifier:
+    """Scores messages and tracks how many still reach the LLM."""
+
+    def __init__(self):
+        self.total = 0
+        self.local_yes = 0
+        self.local_no = 0
+        self.escalated = 0
+
+    async def classify(self, message, history, bot_user_id,
+                       seconds_since_bot, window_seconds):
+        """Returns (probability, features) for a message."""
+        from cogs import memory_manager
+
+        reply_to_bot = reply_to_other = False
+        ref = message.reference
+        if ref is not None and ref.message_id:
+            author_id = None
+            resolved = getattr(ref, 'resolved', None)
+            if resolved is not None and hasattr(resolved, 'author'):
+                author_id = resolved.author.id
+            else:
+                for record in history:
+                    if record.id == ref.message_id:
+                        author_id = record.author_id
+                        break
+            if author_id is not None:
+                reply_to_bot = author_id == bot_user_id
+                reply_to_other = not reply_to_bot
+
+        mentions_other = any(
+            user.id != bot_user_id for user in message.mentions
+        )
+
+        # Bot's last message and how many humans spoke since
+        bot_last = None
+        humans_since_bot = set()
+        for record in reversed(history):
+            if record.id == message.id:
+                continue
+            if record.author_id == bot_user_id:
+                bot_last = record
+                break
+            if not record.is_bot:
+                humans_since_bot.add(record.author_id)
+        humans_since_bot.discard(message.author.id)
+
+        similarity = 0.0
+        if bot_last is not None and message.content.strip():
+            vecs = await memory_manager.embed_texts(
+                [message.content, bot_last.content]
+            )
+            if vecs:
+                similarity = sum(a * b for a, b in zip(*vecs))
+
+        features = extract_features(
+            message.content,
+            reply_to_bot=reply_to_bot,
+            reply_to_other=reply_to_other,
+            mentions_other=mentions_other,
+            seconds_since_bot=seconds_since_bot,
+            window_seconds=window_seconds,
+            similarity=similarity,
+            humans_since_bot=len(humans_since_bot),
+        )
+        return score(features), features
+
+    def record(self, probability, features, decision,
+               llm_answer=None):
+        """Count a decision and append it to the replay log."""
+        self.total += 1
+        if llm_answer is not None:
+            self.escalated += 1
+        elif decision:
+            self.local_yes += 1
+        else:
+            self.local_no += 1
+
+        if self.total % STATS_LOG_EVERY == 0:
+            logger.info(
+                f"Engagement classifier: {self.total} decisions, "
+                f"{self.local_yes} local yes, {self.local_no} local "
+                f"no, {self.escalated} escalated to LLM "
+                f"({self.escalation_rate():.0%})"
+            )
+
+        if ENGAGEMENT_LOG_PATH:
+            entry = {
+                'features': features,
+                'probability': round(probability, 4),
+                'decision': decision,
+                'llm_answer': llm_answer,
+            }
+            try:
+                with open(ENGAGEMENT_LOG_PATH, 'a') as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to write engagement log: {e}")
+
+    def escalation_rate(self):
+        return self.escalated / self.total if self.total else 0.0
@@ -0,0 +1,150 @@
+"""
+Write-ahead log of in-flight episode buffers.
+
+Episodes are built in memory and only reach the database once they
+are summarized, so a restart would lose every partial episode. Each
+message added to an episode is also queued here and written to the
+episode_buffer table in batches every EPISODE_FLUSH_SECONDS, so
+ingestion itself never waits on the database. When an episode is
+summarized or discarded its rows are deleted, again in the next
+batch. On startup load() returns what was still buffered.
+
+A crash loses at most the last flush interval of messages.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from cogs.memory_manager import EpisodeMessage
+
+logger = logging.getLogger('bangabot')
+
+EPISODE_FLUSH_SECONDS = 15
+# Flush early once this many messages are waiting
+FLUSH_BATCH_MAX = 500
+# Messages kept for retry while the database is unreachable
+PENDING_MAX = 5000
+
+_INSERT_SQL = (
+    "INSERT INTO episode_buffer "
+    "(channel_id, message_id, author, author_id, content, is_bot, "
+    " created_at) "
+    "VALUES (:channel_id, :message_id, :author, :author_id, :content, "
+    " :is_bot, :created_at)"
+)
+
+# Message ids are snowflakes, so everything up to the episode's last
+# message belongs to it or to an earlier episode
+_DELETE_SQL = (
+    "DELETE FROM episode_buffer "
+    "WHERE channel_id = :channel_id AND message_id <= :message_id"
+)
+
+_LOAD_SQL = (
+    "SELECT channel_id, message_id, author, author_id, content, "
+    "is_bot, created_at FROM episode_buffer "
+    "ORDER BY channel_id, message_id"
+)
+
+
+class EpisodeLog:
+    def __init__(self, flush_seconds=EPISODE_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending = []   # insert params, oldest first
+        self._cleared = {}   # channel_id -> last message id to delete
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._early_flush = None  # early flush task, one at a time
+
+    def append(self, channel_id, msg):
+        """Queue one episode message for the next flush."""
+        self._pending.append({
+            "channel_id": str(channel_id), "message_id": msg.id,
+            "author": msg.author, "author_id": msg.author_id,
+            "content": msg.content, "is_bot": msg.is_bot,
+            "created_at": msg.timestamp,
+        })
+        # >=: a failed flush puts its rows back, so the queue can
+        # already be past the limit
+        if (len(self._pending) >= FLUSH_BATCH_MAX
+                and (self._early_flush is None
+                     or self._early_flush.done())):
+            self._early_flush = asyncio.create_task(self.flush())
+
+    def clear(self, channel_id, last_message_id):
+        """Queue deletion of a finished episode's rows."""
+        channel_id = str(channel_id)
+        self._cleared[channel_id] = max(
+            last_message_id, self._cleared.get(channel_id, 0)
+        )
+
+    @staticmethod
+    def _flush_sync(inserts, deletes):
+        from database.database import engine
+        with engine.begin() as conn:
+            # Inserts first: a batch can hold both the tail of an
+            # episode and its deletion
+            if inserts:
+                conn.execute(text(_INSERT_SQL), inserts)
+            if deletes:
+                conn.execute(text(_DELETE_SQL), [
+                    {"channel_id": channel_id, "message_id": message_id}
+                    for channel_id, message_id in deletes.items()
+                ])
+
+    async def flush(self):
+        async with self._lock:
+            inserts, self._pending = self._pending, []
+            deletes, self._cleared = self._cleared, {}
+            if not inserts and not deletes:
+                return
+            try:
+                await asyncio.to_thread(self._flush_sync, inserts, deletes)
+            except Exception as e:
+                logger.error(f"Episode log flush failed: {e}")
+                # Put the batch back in front of anything queued
+                # meanwhile, and retry next time
+                self._pending = (inserts + self._pending)[-PENDING_MAX:]
+                for channel_id, message_id in deletes.items():
+                    self.clear(channel_id, message_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out what is queued."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    @staticmethod
+    def _load_sync():
+        from database.database import engine
+        with engine.begin() as conn:
+            return conn.execute(text(_LOAD_SQL)).fetchall()
+
+    async def load(self):
+        """Buffered episodes as {channel_id: [EpisodeMessage]},
+        oldest message first."""
+        try:
+            rows = await asyncio.to_thread(self._load_sync)
+        except Exception as e:
+            logger.error(f"Failed to load episode log: {e}")
+            return {}
+        episodes = defaultdict(list)
+        for (channel_id, message_id, author, author_id, content,
+             is_bot, created_at) in rows:
+            episodes[int(channel_id)].append(EpisodeMessage(
+                message_id, author, author_id, content, is_bot,
+                created_at,
+            ))
+        return dict(episodes)
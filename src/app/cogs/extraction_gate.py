@@ -0,0 +1,202 @@
+"""
+Local gate in front of memory extraction.
+
+Most conversation windows contain nothing worth remembering, and the
+extraction prompt's default answer is empty arrays. The gate scores a
+window from cheap signals (self-disclosure phrases, first-person
+statements, named entities and numbers) plus MiniLM similarity to a
+handful of memorable example lines, and windows scoring below
+GATE_THRESHOLD skip the LLM call.
+
+Windows where someone mentions or replies to the bot are never
+skipped: extraction is also where sentiment toward the bot is
+updated, and short hostile or joking lines score low on the
+memorability features.
+
+EXTRACTION_GATE_MODE:
+    enforce  skip low-scoring windows
+    shadow   extract everything, but count how many windows the gate
+             would have skipped that still produced memories (default)
+    off      no gating
+
+The weights are hand-set and haven't been checked against labelled
+windows yet, so the gate ships in shadow mode; switch to enforce once
+the shadow miss counts look acceptable.
+"""
+import os
+import re
+import math
+import logging
+
+logger = logging.getLogger('bangabot')
+
+EXTRACTION_GATE_MODE = os.getenv('EXTRACTION_GATE_MODE', 'shadow').lower()
+# Windows scoring below this skip extraction
+GATE_THRESHOLD = 0.3
+STATS_LOG_EVERY = 20
+
+# Logistic weights over the features below. Hand-set; run with
+# EXTRACTION_GATE_MODE=shadow to see what the gate would miss before
+# changing them.
+WEIGHTS = {
+    'bias': -2.5,
+    'disclosure': 3.0,
+    'first_person': 1.5,
+    'entities': 1.0,
+    'numbers': 0.5,
+    'exemplar': 3.0,
+}
+
+MEMORABLE_EXAMPLES = [
+    "I just started a new job as a nurse",
+    "my wife and I are moving to Denver next month",
+    "I have two cats named Milo and Luna",
+    "my birthday is on March 3rd",
+    "I'm learning Japanese because I want to visit Tokyo",
+    "I hate pineapple on pizza",
+    "I finally got my degree in computer science",
+    "my dad is in the hospital",
+    "I've been playing guitar for ten years",
+    "we broke up last week",
+    "I main Wraith and I'm diamond rank",
+    "BangaBot you should stop roasting me",
+]
+
+_DISCLOSURE = re.compile(
+    r"\b(i'?m (a|an|from|moving|getting|going|starting|learning)"
+    r"|i (am|work|live|just|got|have|had|hate|love|moved|started"
+    r"|quit|finished|graduated|bought|lost|broke)"
+    r"|i'?ve been|i'?ll be"
+    r"|my (name|job|wife|husband|girlfriend|boyfriend|partner|kid"
+    r"|son|daughter|mom|dad|brother|sister|dog|cat|birthday|house"
+    r"|car|boss|favorite|favourite)"
+    r"|birthday|anniversary|wedding|pregnant|promoted|diagnosed)\b",
+    re.IGNORECASE,
+)
+_FIRST_PERSON = re.compile(r"\b(i|i'm|i've|i'll|my|me|we|our)\b",
+                           re.IGNORECASE)
+# Capitalised words not at the start of a sentence
+_ENTITY = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]{2,}\b")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def extract_features(lines, exemplar_similarity=0.0):
+    """Feature dict for a window's human lines. All values are in
+    [0, 1]."""
+    if not lines:
+        return {name: 0.0 for name in WEIGHTS if name != 'bias'}
+    disclosures = sum(1 for line in lines if _DISCLOSURE.search(line))
+    first_person = sum(
+        1 for line in lines if _FIRST_PERSON.search(line)
+    )
+    entities = sum(len(_ENTITY.findall(line)) for line in lines)
+    numbers = sum(len(_NUMBER.findall(line)) for line in lines)
+    return {
+        'disclosure': min(1.0, disclosures / 2),
+        'first_person': first_person / len(lines),
+        'entities': min(1.0, entities / 3),
+        'numbers': min(1.0, numbers / 2),
+        'exemplar': max(0.0, min(1.0, exemplar_similarity)),
+    }
+
+
+def score(features, weights=None):
+    """Probability that the window holds something memorable."""
+    weights = weights or WEIGHTS
+    z = weights['bias'] + sum(
+        weights[name] * value for name, value in features.items()
+    )
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class ExtractionGate:
+    """Scores windows and tracks skip and shadow-miss rates."""
+
+    def __init__(self, mode=EXTRACTION_GATE_MODE):
+        self.mode = mode
+        self.total = 0
+        self.skipped = 0
+        # Shadow mode: windows the gate would have skipped, and how
+        # many of those extraction found something in
+        self.would_skip = 0
+        self.missed = 0
+        # Windows addressed to the bot, which always pass
+        self.directed = 0
+        self._exemplars = None
+
+    async def _exemplar_similarity(self, lines):
+        """Best cosine similarity between any line and any example."""
+        import numpy as np
+        from cogs import memory_manager
+
+        if self._exemplars is None:
+            vecs = await memory_manager.embed_texts(MEMORABLE_EXAMPLES)
+            if not vecs:
+                return 0.0
+            self._exemplars = np.array(vecs, dtype=np.float32)
+        vecs = await memory_manager.embed_texts(lines)
+        if not vecs:
+            return 0.0
+        sims = np.array(vecs, dtype=np.float32) @ self._exemplars.T
+        return float(sims.max())
+
+    async def check(self, lines, directed=False):
+        """Returns (should_extract, probability) for a window's human
+        lines. directed windows (someone mentioned or replied to the
+        bot) always pass. In shadow and off modes should_extract is
+        always True."""
+        if self.mode == 'off':
+            return True, 1.0
+        if directed:
+            self.directed += 1
+            return True, 1.0
+        lines = [line for line in lines if line.strip()]
+        similarity = 0.0
+        if lines:
+            try:
+                similarity = await self._exemplar_similarity(lines)
+            except Exception as e:
+                logger.error(f"Extraction gate embedding failed: {e}")
+        probability = score(extract_features(lines, similarity))
+        passed = probability >= GATE_THRESHOLD
+
+        self.total += 1
+        if not passed:
+            if self.mode == 'shadow':
+                self.would_skip += 1
+            else:
+                self.skipped += 1
+        if self.total % STATS_LOG_EVERY == 0:
+            self.log_stats()
+        return passed or self.mode == 'shadow', probability
+
+    def record_result(self, probability, found):
+        """Shadow mode: note whether a window the gate would have
+        skipped produced memories anyway."""
+        if self.mode == 'shadow' and probability < GATE_THRESHOLD:
+            if found:
+                self.missed += 1
+                logger.info(
+                    f"Extraction gate would have missed {found} "
+                    f"item(s) (p={probability:.2f})"
+                )
+
+    def skip_rate(self):
+        skipped = self.would_skip if self.mode == 'shadow' else self.skipped
+        return skipped / self.total if self.total else 0.0
+
+    def log_stats(self):
+        if self.mode == 'shadow':
+            logger.info(
+                f"Extraction gate (shadow): {self.total} windows, "
+                f"would skip {self.would_skip} "
+                f"({self.skip_rate():.0%}), {self.missed} of those "
+                f"produced memories; {self.directed} directed at "
+                f"the bot passed"
+            )
+        else:
+            logger.info(
+                f"Extraction gate: {self.total} windows, skipped "
+                f"{self.skipped} ({self.skip_rate():.0%}), "
+                f"{self.directed} directed at the bot passed"
+            )
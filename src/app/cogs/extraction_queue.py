@@ -0,0 +1,116 @@
+"""
+Per-channel debounced memory extraction.
+
+Replies don't extract memories directly. Each reply adds the messages
+it answered to its channel's open window, and the window is extracted
+once: after EXTRACTION_IDLE_SECONDS without another reply, or as soon
+as it holds EXTRACTION_WINDOW_MAX messages. At flush the window is
+topped up from the channel's message buffer, which picks up the bot's
+own replies. Messages already covered by an earlier window are not
+sent again.
+"""
+import os
+import asyncio
+import logging
+
+from cogs.state_store import TTLMap
+
+logger = logging.getLogger('bangabot')
+
+EXTRACTION_IDLE_SECONDS = float(
+    os.getenv('EXTRACTION_IDLE_SECONDS', '120')
+)
+EXTRACTION_WINDOW_MAX = int(os.getenv('EXTRACTION_WINDOW_MAX', '30'))
+# A full window still waits briefly so the reply that filled it has
+# arrived back through the gateway
+FLUSH_GRACE_SECONDS = 5
+# How long to remember where a channel's last extraction ended
+EXTRACTED_TTL = 6 * 3600
+
+
+class _Window:
+    __slots__ = ('records', 'replies', 'timer')
+
+    def __init__(self):
+        self.records = {}  # message id -> MessageRecord
+        self.replies = 0
+        self.timer = None
+
+
+class ExtractionQueue:
+    def __init__(self, extract, recent,
+                 idle_seconds=EXTRACTION_IDLE_SECONDS,
+                 window_max=EXTRACTION_WINDOW_MAX):
+        # extract(channel_id, records) -> coroutine; records are
+        # the window's MessageRecords oldest first.
+        # recent(channel_id) -> buffered MessageRecords
+        self._extract = extract
+        self._recent = recent
+        self.idle_seconds = idle_seconds
+        self.window_max = window_max
+        self._windows = {}       # channel_id -> _Window
+        # channel_id -> last extracted message id
+        self._extracted_to = TTLMap('extracted_to', EXTRACTED_TTL)
+        self.replies = 0
+        self.extractions = 0
+
+    def add(self, channel_id, records):
+        """Add a reply's context to the channel's window."""
+        window = self._windows.get(channel_id)
+        if window is None:
+            window = _Window()
+            self._windows[channel_id] = window
+
+        floor = self._extracted_to.get(channel_id, 0)
+        for record in records:
+            if record.id > floor:
+                window.records[record.id] = record
+        window.replies += 1
+        self.replies += 1
+
+        if window.timer is not None:
+            window.timer.cancel()
+        delay = self.idle_seconds
+        if len(window.records) >= self.window_max:
+            delay = FLUSH_GRACE_SECONDS
+        window.timer = asyncio.get_running_loop().call_later(
+            delay, self.flush, channel_id
+        )
+
+    def flush(self, channel_id):
+        """Close the channel's window and extract it in the
+        background."""
+        window = self._windows.pop(channel_id, None)
+        if window is None:
+            return
+        if window.timer is not None:
+            window.timer.cancel()
+        if not window.records:
+            return
+
+        first = min(window.records)
+        for record in self._recent(channel_id):
+            if record.id > first:
+                window.records.setdefault(record.id, record)
+        records = [window.records[i] for i in sorted(window.records)]
+        self._extracted_to[channel_id] = records[-1].id
+        self.extractions += 1
+        logger.debug(
+            f"Extracting window of {len(records)} messages "
+            f"({window.replies} replies) in channel {channel_id}"
+        )
+        asyncio.create_task(self._run(channel_id, records))
+
+    async def _run(self, channel_id, records):
+        try:
+            await self._extract(channel_id, records)
+        except Exception as e:
+            logger.error(f"Memory extraction error: {e}", exc_info=True)
+
+    def flush_all(self):
+        for channel_id in list(self._windows):
+            self.flush(channel_id)
+
+    def extraction_ratio(self):
+        """Extraction calls per reply so far."""
+        return self.extractions / self.replies if self.replies else 0.0
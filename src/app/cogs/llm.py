@@ -0,0 +1,334 @@
+"""
+Shared helpers for Anthropic API calls: system prompt blocks,
+per-call-type usage logging, and the priority scheduler every call
+goes through.
+"""
+import os
+import sys
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import collections
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger('bangabot')
+
+
+def text_block(text_str):
+    """System prompt block."""
+    return {"type": "text", "text": text_str}
+
+
+def log_usage(call_type, response):
+    """Log token usage, including prompt cache reads and writes."""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+    cache_write = (
+        getattr(usage, 'cache_creation_input_tokens', None) or 0
+    )
+    logger.info(
+        f"LLM usage [{call_type}]: "
+        f"input={usage.input_tokens} "
+        f"output={usage.output_tokens} "
+        f"cache_read={cache_read} "
+        f"cache_write={cache_write}"
+    )
+
+
+# Priority classes, lowest value served first
+PRIORITY_MENTION = 0
+PRIORITY_ENGAGED = 1
+PRIORITY_CHIME_IN = 2
+PRIORITY_BACKGROUND = 3
+
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_BACKGROUND_CONCURRENCY = int(
+    os.getenv('LLM_BACKGROUND_CONCURRENCY', '1')
+)
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+# Share of the request budget kept back for user-facing calls;
+# background work only starts while more than this is left
+LLM_BACKGROUND_RESERVE = float(
+    os.getenv('LLM_BACKGROUND_RESERVE', '0.25')
+)
+# Requests per minute assumed until the API reports the real limit
+DEFAULT_REQUESTS_PER_MINUTE = 50
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+
+def _parse_reset(value):
+    """Seconds until an RFC 3339 reset timestamp, or None."""
+    if not value:
+        return None
+    try:
+        reset = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return max(0.0, (reset - datetime.now(timezone.utc)).total_seconds())
+
+
+def _retryable(error):
+    """True for rate limits (429), overload (529) and other 5xx
+    responses, and connection failures."""
+    import anthropic
+
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class LLMScheduler:
+    """Single gateway for Anthropic calls.
+
+    Calls wait in a priority queue for one of a bounded number of
+    slots and for a token from a request bucket that is refilled at
+    the rate limit the API reports in its response headers. Failed
+    calls are retried with jittered backoff, honouring retry-after.
+    Background calls get fewer slots and only start while the bucket
+    is above LLM_BACKGROUND_RESERVE, so they back off first under
+    load. The client should be built with max_retries=0 so retries
+    happen here, outside any slot.
+    """
+
+    def __init__(self, client, max_concurrency=LLM_MAX_CONCURRENCY,
+                 background_concurrency=LLM_BACKGROUND_CONCURRENCY,
+                 max_retries=LLM_MAX_RETRIES):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.background_concurrency = background_concurrency
+        self.max_retries = max_retries
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._active = 0
+        self._active_background = 0
+        self._capacity = float(DEFAULT_REQUESTS_PER_MINUTE)
+        self._tokens = self._capacity
+        self._refill_rate = self._capacity / 60.0
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0  # no new calls before this
+        self._wakeup = None
+        self._admitted_at = collections.deque()  # last hour
+        self.retries = 0
+
+    def queue_depth(self, priority=None):
+        """Calls waiting for a slot, optionally of one priority."""
+        return sum(
+            1 for p, _seq, fut in self._waiters
+            if not fut.done() and (priority is None or p == priority)
+        )
+
+    def calls_in_last_hour(self):
+        cutoff = time.monotonic() - 3600
+        while self._admitted_at and self._admitted_at[0] < cutoff:
+            self._admitted_at.popleft()
+        return len(self._admitted_at)
+
+    # -- admission ---------------------------------------------------
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity,
+            self._tokens + (now - self._refilled_at) * self._refill_rate,
+        )
+        self._refilled_at = now
+
+    def _dispatch(self):
+        """Admit waiting calls, highest priority first, while slots
+        and rate-limit tokens allow."""
+        self._refill()
+        wait = None
+        while self._waiters:
+            priority, _seq, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._active >= self.max_concurrency:
+                break
+            background = priority >= PRIORITY_BACKGROUND
+            if (background and self._active_background
+                    >= self.background_concurrency):
+                break
+            now = time.monotonic()
+            if now < self._paused_until:
+                wait = self._paused_until - now
+                break
+            needed = 1.0
+            if background:
+                needed += self._capacity * LLM_BACKGROUND_RESERVE
+            if self._tokens < needed:
+                wait = (needed - self._tokens) / self._refill_rate
+                break
+            heapq.heappop(self._waiters)
+            self._tokens -= 1.0
+            self._admitted_at.append(now)
+            self._active += 1
+            if background:
+                self._active_background += 1
+            fut.set_result(None)
+
+        if wait is not None and self._wakeup is None:
+            self._wakeup = asyncio.get_running_loop().call_later(
+                wait, self._on_wakeup
+            )
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    async def _acquire(self, priority):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Admitted just as we were cancelled
+                self._release(priority)
+            raise
+
+    def _release(self, priority):
+        self._active -= 1
+        if priority >= PRIORITY_BACKGROUND:
+            self._active_background -= 1
+        self._dispatch()
+
+    # -- rate-limit feedback -----------------------------------------
+
+    def _update_limits(self, headers):
+        """Sync the bucket with anthropic-ratelimit-requests-*."""
+        if headers is None:
+            return
+        try:
+            limit = int(headers.get('anthropic-ratelimit-requests-limit'))
+            remaining = int(
+                headers.get('anthropic-ratelimit-requests-remaining')
+            )
+        except (TypeError, ValueError):
+            return
+        self._refill()
+        self._capacity = float(max(1, limit))
+        reset_in = _parse_reset(
+            headers.get('anthropic-ratelimit-requests-reset')
+        )
+        if reset_in and remaining < limit:
+            # Refill at whatever rate reaches the limit by reset
+            self._refill_rate = max(
+                self._capacity / 60.0, (limit - remaining) / reset_in
+            )
+        else:
+            self._refill_rate = self._capacity / 60.0
+        self._tokens = min(self._tokens, float(remaining))
+
+    def _retry_delay(self, error, attempt):
+        """Backoff before the next attempt, and pause admission on
+        rate limits so queued calls don't pile onto the API."""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if headers is not None:
+            self._update_limits(headers)
+
+        retry_after = None
+        if headers is not None:
+            try:
+                retry_after = float(headers.get('retry-after'))
+            except (TypeError, ValueError):
+                retry_after = None
+        backoff = min(
+            RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt
+        )
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, backoff / 2)
+        else:
+            # Full jitter
+            delay = random.uniform(backoff / 2, backoff)
+
+        if getattr(error, 'status_code', None) == 429:
+            self._tokens = 0.0
+            self._paused_until = max(
+                self._paused_until,
+                time.monotonic() + (retry_after or backoff),
+            )
+        return delay
+
+    async def _retry_or_raise(self, error, attempt, call_type):
+        if not _retryable(error) or attempt >= self.max_retries:
+            raise error
+        self.retries += 1
+        delay = self._retry_delay(error, attempt)
+        logger.warning(
+            f"LLM call [{call_type}] failed ({error}); retrying in "
+            f"{delay:.1f}s ({attempt + 1}/{self.max_retries})"
+        )
+        await asyncio.sleep(delay)
+
+    # -- calls -------------------------------------------------------
+
+    async def create(self, priority, call_type, **kwargs):
+        """messages.create through the queue; logs usage."""
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            try:
+                messages = self.client.messages
+                raw = await messages.with_raw_response.create(**kwargs)
+                self._update_limits(raw.headers)
+                response = raw.parse()
+            except Exception as e:
+                error = e
+            else:
+                log_usage(call_type, response)
+                return response
+            finally:
+                self._release(priority)
+            await self._retry_or_raise(error, attempt, call_type)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, priority, call_type, **kwargs):
+        """messages.stream through the queue. Only opening the
+        stream is retried; the slot is held until the stream is
+        closed. Logs usage if the stream was read to the end."""
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            manager = self.client.messages.stream(**kwargs)
+            try:
+                stream = await manager.__aenter__()
+                break
+            except Exception as e:
+                self._release(priority)
+                error = e
+            except BaseException:
+                self._release(priority)
+                raise
+            await self._retry_or_raise(error, attempt, call_type)
+            attempt += 1
+
+        try:
+            # Everything after the stream is open runs under this
+            # try, so the HTTP stream is closed on every path,
+            # including a failing get_final_message
+            try:
+                response = getattr(stream, 'response', None)
+                self._update_limits(getattr(response, 'headers', None))
+                yield stream
+                message = await stream.get_final_message()
+            except BaseException:
+                if not await manager.__aexit__(*sys.exc_info()):
+                    raise
+            else:
+                await manager.__aexit__(None, None, None)
+                log_usage(call_type, message)
+        finally:
+            self._release(priority)
@@ -0,0 +1,117 @@
+"""
+Versioned cache of assembled memory prompt blocks.
+
+While the same people keep talking about the same thing, every reply
+would retrieve and assemble the same [CORE MEMORIES], [RELATIONSHIPS]
+and [RECENT CONTEXT] blocks. Entries are keyed by channel, participant
+set and a coarse topic bucket (sign bits of a few fixed random
+projections of the conversation embedding, so similar conversations
+share a bucket).
+
+Invalidation is by version counters rather than TTL. Each user has a
+counter, bumped when their memories or sentiment change, and a global
+counter is bumped when bot memories, summaries or stored embeddings
+change. An entry is served only while the global counter and every
+participant's counter still match the values read before it was
+built. Memories of people outside the conversation can only enter a
+block through search; writes to those don't invalidate it.
+"""
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger('bangabot')
+
+TOPIC_BITS = 6
+CACHE_SIZE = 256
+STATS_LOG_EVERY = 100
+
+_user_versions = {}  # user_id -> counter
+_global_version = 0
+
+
+def bump_user(user_id):
+    """Invalidate cached blocks involving this user."""
+    user_id = str(user_id)
+    _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+
+
+def bump_global():
+    """Invalidate every cached block."""
+    global _global_version
+    _global_version += 1
+
+
+def snapshot(user_ids):
+    """Current versions for a participant set."""
+    return (
+        _global_version,
+        tuple(sorted(
+            (uid, _user_versions.get(uid, 0)) for uid in user_ids
+        )),
+    )
+
+
+class MemoryBlockCache:
+    def __init__(self, size=CACHE_SIZE, topic_bits=TOPIC_BITS):
+        self.size = size
+        self.topic_bits = topic_bits
+        self._planes = None
+        self._entries = OrderedDict()  # key -> (versions, blocks)
+        self.hits = 0
+        self.misses = 0
+
+    def topic_bucket(self, conv_vec):
+        """Coarse topic id for a conversation embedding."""
+        if conv_vec is None:
+            return None
+        import numpy as np
+
+        if self._planes is None:
+            rng = np.random.default_rng(0)
+            self._planes = rng.standard_normal(
+                (self.topic_bits, len(conv_vec))
+            ).astype(np.float32)
+        signs = self._planes @ np.asarray(conv_vec, dtype=np.float32)
+        return int(sum(1 << i for i, s in enumerate(signs) if s > 0))
+
+    def key(self, channel_id, participants, conv_vec):
+        return (
+            channel_id, frozenset(participants),
+            self.topic_bucket(conv_vec),
+        )
+
+    def get(self, key, record=True):
+        """Cached blocks for key if still current, else None.
+        record=False leaves the hit/miss stats alone."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == snapshot(key[1]):
+            self._entries.move_to_end(key)
+            if record:
+                self._count(hit=True)
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        if record:
+            self._count(hit=False)
+        return None
+
+    def put(self, key, versions, blocks):
+        """Store blocks built from data read at versions (taken
+        with snapshot() before retrieval started)."""
+        self._entries[key] = (versions, blocks)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        total = self.hits + self.misses
+        if total % STATS_LOG_EVERY == 0:
+            logger.info(
+                f"Memory block cache: {self.hits}/{total} hits "
+                f"({self.hits / total:.0%}), "
+                f"{len(self._entries)} entries"
+            )
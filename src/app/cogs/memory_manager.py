@@ -3,17 +3,52 @@ Memory manager: embeddings, vector search, episodic summaries,
 and similarity-based deduplication.
 
 Uses sentence-transformers with all-MiniLM-L6-v2 for local
-embeddings (384 dims). No external API key required.
+embeddings (384 dims). No external API key required. Set
+EMBEDDING_MODEL_PATH to a directory staged by cogs/model_store.py
+to load the model offline from memory-mapped safetensors.
 """
+import os
 import time
 import asyncio
 import logging
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
+from collections import OrderedDict
 
 from sqlalchemy import text
 
+from cogs.llm import PRIORITY_BACKGROUND
+from cogs import memory_blocks
+
 logger = logging.getLogger('bangabot')
 
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_MODEL_PATH = os.getenv('EMBEDDING_MODEL_PATH')
+EMBEDDING_MODEL_SHA256 = os.getenv('EMBEDDING_MODEL_SHA256')
+if EMBEDDING_MODEL_PATH:
+    # Before anything can import huggingface_hub
+    from cogs.model_store import force_offline
+    force_offline()
+
+# 'vector' (full precision) or 'halfvec' (half the storage). Used in
+# SQL casts, so anything else falls back to 'vector'.
+VECTOR_STORAGE = os.getenv('VECTOR_STORAGE', 'vector').lower()
+if VECTOR_STORAGE not in ('vector', 'halfvec'):
+    logger.warning(
+        f"Unknown VECTOR_STORAGE '{VECTOR_STORAGE}', using 'vector'"
+    )
+    VECTOR_STORAGE = 'vector'
+# 'exact' cosine scan or 'binary' Hamming prefilter + cosine re-rank
+VECTOR_SEARCH_MODE = os.getenv('VECTOR_SEARCH_MODE', 'exact')
+# Hamming candidates fetched per requested result in 'binary' mode
+BINARY_CANDIDATE_FACTOR = 4
+# 'hybrid' (full-text + vector, rank-fused) or 'vector' retrieval
+MEMORY_RETRIEVAL_MODE = os.getenv('MEMORY_RETRIEVAL_MODE', 'hybrid')
+# Reciprocal rank fusion constant and per-leg candidate pool factor
+RRF_K = 60
+HYBRID_POOL_FACTOR = 3
+
 # Local embedding model (lazy-initialized)
 _model = None
 _model_failed = False
@@ -26,11 +61,19 @@ def _get_model():
     if _model_failed:
         return None
     try:
-        from sentence_transformers import SentenceTransformer
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
+        if EMBEDDING_MODEL_PATH:
+            from cogs import model_store
+            _model = model_store.load_model(
+                EMBEDDING_MODEL_PATH, EMBEDDING_MODEL_SHA256
+            )
+            source = EMBEDDING_MODEL_PATH
+        else:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            source = EMBEDDING_MODEL_NAME
         logger.info(
-            "Loaded embedding model: all-MiniLM-L6-v2 "
-            "(384 dims)"
+            f"Loaded embedding model: {source} "
+            f"(384 dims)"
         )
         return _model
     except Exception as e:
@@ -46,9 +89,27 @@ def estimate_tokens(text_str):
 
 # --- Embedding ---
 
-# Cache: channel_id -> (timestamp, embedding_vector)
-_embedding_cache = {}
-_CACHE_TTL = 60  # seconds
+# Conversation window size (messages) used for retrieval
+CONVERSATION_WINDOW = 5
+
+# LRU cache keyed on content rather than channel:
+# window lines -> conversation vector
+_embedding_cache = OrderedDict()
+_WINDOW_CACHE_SIZE = 256
+
+
+def _lru_get(cache, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache, key, value, max_size):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
 
 
 async def embed_text(text_str):
@@ -66,46 +127,57 @@ async def embed_text(text_str):
         return None
 
 
-async def get_conversation_embedding(channel_id, messages):
-    """Get embedding for conversation context, with 60s cache."""
-    now = time.time()
-    cached = _embedding_cache.get(channel_id)
-    if cached and (now - cached[0]) < _CACHE_TTL:
-        return cached[1]
+async def embed_texts(texts):
+    """Embed several strings in one model call.
 
-    context = "\n".join(
-        f"{msg.author.display_name}: {msg.content}"
-        for msg in messages[-5:]
+    Returns list[list[float]] in input order, or None.
+    """
+    model = _get_model()
+    if not model or not texts:
+        return None
+    try:
+        vecs = await asyncio.to_thread(
+            model.encode, list(texts)
+        )
+        return [vec.tolist() for vec in vecs]
+    except Exception as e:
+        logger.error(f"Batch embedding failed: {e}")
+        return None
+
+
+def conversation_lines(messages):
+    """Formatted lines of the recent conversation window."""
+    return tuple(
+        f"{msg.author_name}: {msg.content}"
+        for msg in messages[-CONVERSATION_WINDOW:]
         if msg.content.strip()
     )
-    if not context:
+
+
+async def get_conversation_embedding(messages):
+    """Get embedding for the last few messages of a conversation.
+
+    The window's lines are embedded joined, as one text. Cached on
+    the content of the window, so a newer message always produces a
+    fresh vector while repeated lookups for the same window (block
+    key, retrieval) share one encode.
+    """
+    lines = conversation_lines(messages)
+    if not lines:
         return None
 
-    vec = await embed_text(context)
-    if vec:
-        _embedding_cache[channel_id] = (now, vec)
+    cached = _lru_get(_embedding_cache, lines)
+    if cached is not None:
+        return cached
+
+    vec = await embed_text("\n".join(lines))
+    if vec is not None:
+        _lru_put(_embedding_cache, lines, vec, _WINDOW_CACHE_SIZE)
     return vec
 
 
 # --- Embedding storage (background tasks) ---
 
-async def store_embedding_for_memory(db, memory_row, table_name):
-    """Compute and store an embedding for a memory row."""
-    vec = await embed_text(memory_row.fact)
-    if vec is None:
-        return
-    try:
-        await asyncio.to_thread(
-            _store_embedding_sync, db, table_name,
-            memory_row.id, vec
-        )
-    except Exception as e:
-        logger.error(
-            f"Failed to store embedding for {table_name} "
-            f"id={memory_row.id}: {e}"
-        )
-
-
 def _store_embedding_sync(db, table_name, row_id, vec):
     """Synchronous helper to store embedding via raw SQL."""
     from database.database import engine
@@ -130,6 +202,7 @@ async def store_embedding_for_summary(db, summary_row):
             _store_embedding_sync, db, 'episodic_summaries',
             summary_row.id, vec
         )
+        memory_blocks.bump_global()
     except Exception as e:
         logger.error(
             f"Failed to store embedding for summary "
@@ -139,19 +212,80 @@ async def store_embedding_for_summary(db, summary_row):
 
 # --- Vector search ---
 
-def _vector_search_sync(db, table_name, query_vec, limit=15):
-    """Run a vector similarity search. Returns list of row IDs."""
+# Statement timeout (ms) for queries run by the current retrieval
+# stage. Set by timed(); asyncio.to_thread carries it into the worker
+# thread.
+_stage_timeout = contextvars.ContextVar('stage_timeout', default=None)
+
+
+@contextmanager
+def _stage_connection():
+    """engine.begin(), with the current stage's deadline applied as
+    a statement timeout so a query the caller gave up on is also
+    cancelled in the database instead of holding its thread."""
     from database.database import engine
-    vec_str = "[" + ",".join(str(v) for v in query_vec) + "]"
     with engine.begin() as conn:
+        timeout_ms = _stage_timeout.get()
+        if timeout_ms is not None:
+            conn.execute(text(
+                f"SET LOCAL statement_timeout = {int(timeout_ms)}"
+            ))
+        yield conn
+
+
+def _semantic_sql(table_name, mode):
+    """SQL selecting (id, dist) of the :pool rows nearest to :vec.
+
+    mode 'exact' orders the whole table by cosine distance. mode
+    'binary' takes the :cand nearest candidates by Hamming distance
+    on the binary-quantized column, then re-ranks them by exact
+    cosine distance.
+    """
+    if mode == 'binary':
+        return (
+            f"SELECT id, embedding <=> :vec AS dist FROM ("
+            f"  SELECT id, embedding FROM {table_name} "
+            f"  WHERE embedding_bits IS NOT NULL "
+            f"  ORDER BY embedding_bits <~> binary_quantize("
+            f"    CAST(:vec AS vector(384)))::bit(384) "
+            f"  LIMIT :cand"
+            f") candidates "
+            f"ORDER BY dist LIMIT :pool"
+        )
+    return (
+        f"SELECT id, embedding <=> :vec AS dist FROM {table_name} "
+        f"WHERE embedding IS NOT NULL "
+        f"ORDER BY dist LIMIT :pool"
+    )
+
+
+def _semantic_params(conn, mode, vec_str, pool,
+                     candidate_factor=None):
+    params = {"vec": vec_str, "pool": pool}
+    if mode == 'binary':
+        candidates = pool * (
+            candidate_factor or BINARY_CANDIDATE_FACTOR
+        )
+        # HNSW returns at most ef_search rows per scan
+        conn.execute(text(
+            f"SET LOCAL hnsw.ef_search = "
+            f"{max(40, min(int(candidates), 1000))}"
+        ))
+        params["cand"] = candidates
+    return params
+
+
+def _vector_search_sync(db, table_name, query_vec, limit=15,
+                        mode=None, candidate_factor=None):
+    """Run a vector similarity search. Returns list of row IDs."""
+    mode = mode or VECTOR_SEARCH_MODE
+    vec_str = "[" + ",".join(str(v) for v in query_vec) + "]"
+    with _stage_connection() as conn:
+        params = _semantic_params(
+            conn, mode, vec_str, limit, candidate_factor
+        )
         result = conn.execute(
-            text(
-                f"SELECT id FROM {table_name} "
-                f"WHERE embedding IS NOT NULL "
-                f"ORDER BY embedding <=> :vec "
-                f"LIMIT :lim"
-            ),
-            {"vec": vec_str, "lim": limit}
+            text(_semantic_sql(table_name, mode)), params
         )
         return [row[0] for row in result.fetchall()]
 
@@ -170,234 +304,508 @@ async def vector_search(db, table_name, query_vec, limit=15):
         return []
 
 
+def _hybrid_search_sync(db, table_name, query_vec, query_text,
+                        limit=15):
+    """Lexical + vector search fused with reciprocal rank fusion
+    in a single statement. Returns list of row IDs."""
+    pool = limit * HYBRID_POOL_FACTOR
+    ctes = [
+        # OR the query terms: a conversation window as an AND
+        # query would almost never match a single fact
+        "query AS ("
+        "  SELECT CAST(replace(CAST(plainto_tsquery("
+        "    'english', :qtext) AS text), '&', '|') AS tsquery) "
+        "    AS tsq"
+        ")",
+        f"lexical AS ("
+        f"  SELECT id, row_number() OVER (ORDER BY score DESC) "
+        f"    AS rnk FROM ("
+        f"    SELECT t.id, ts_rank_cd(t.search_tsv, query.tsq) "
+        f"      AS score "
+        f"    FROM {table_name} t, query "
+        f"    WHERE t.search_tsv @@ query.tsq "
+        f"    ORDER BY score DESC LIMIT :pool"
+        f"  ) l"
+        f")",
+    ]
+    legs = ["SELECT id, rnk FROM lexical"]
+
+    with _stage_connection() as conn:
+        params = {"qtext": query_text or "", "pool": pool}
+        if query_vec is not None:
+            vec_str = "[" + ",".join(str(v) for v in query_vec) + "]"
+            params.update(_semantic_params(
+                conn, VECTOR_SEARCH_MODE, vec_str, pool
+            ))
+            ctes.append(
+                f"semantic AS ("
+                f"  SELECT id, row_number() OVER (ORDER BY dist) "
+                f"    AS rnk FROM ("
+                f"{_semantic_sql(table_name, VECTOR_SEARCH_MODE)}"
+                f"  ) s"
+                f")"
+            )
+            legs.append("SELECT id, rnk FROM semantic")
+
+        params.update({"rrf_k": RRF_K, "lim": limit})
+        result = conn.execute(
+            text(
+                "WITH " + ", ".join(ctes) + " "
+                "SELECT id, sum(1.0 / (:rrf_k + rnk)) AS score "
+                "FROM (" + " UNION ALL ".join(legs) + ") fused "
+                "GROUP BY id ORDER BY score DESC LIMIT :lim"
+            ),
+            params
+        )
+        return [row[0] for row in result.fetchall()]
+
+
+async def search_memories(db, table_name, query_vec, query_text,
+                          limit=15):
+    """Search a memory table using the configured retrieval mode.
+
+    'hybrid' fuses full-text and vector rankings; 'vector' is
+    semantic search only. Returns list of row IDs.
+    """
+    if MEMORY_RETRIEVAL_MODE != 'hybrid':
+        return await vector_search(db, table_name, query_vec, limit)
+    if query_vec is None and not query_text:
+        return []
+    try:
+        return await asyncio.to_thread(
+            _hybrid_search_sync, db, table_name, query_vec,
+            query_text, limit
+        )
+    except Exception as e:
+        logger.error(f"Hybrid search on {table_name} failed: {e}")
+        return await vector_search(db, table_name, query_vec, limit)
+
+
 # --- Retrieval ---
 
+MEMORY_BUDGET = 1000
+SUMMARY_BUDGET = 500
+# Highest-importance memories considered per participant (and bot)
+IMPORTANCE_LIMIT = 50
+# Newest episode summaries from the current channel; older history
+# comes from its latest day, week and month rollups
+CHANNEL_SUMMARY_LIMIT = 3
+
+_IMPORTANCE_SQL = (
+    "SELECT 'user' AS source, m.id, m.user_id, m.user_name, "
+    "  NULL AS category, m.fact, m.importance "
+    "FROM unnest(CAST(:uids AS text[])) AS q(uid) "
+    "CROSS JOIN LATERAL ("
+    "  SELECT id, user_id, user_name, fact, importance "
+    "  FROM user_memories WHERE user_id = q.uid "
+    "  ORDER BY importance DESC, updated_at DESC LIMIT :lim"
+    ") m "
+    "UNION ALL "
+    "SELECT 'bot', id, NULL, NULL, category, fact, importance FROM ("
+    "  SELECT id, category, fact, importance FROM bot_memories "
+    "  ORDER BY importance DESC, updated_at DESC LIMIT :lim"
+    ") b"
+)
+
+
+def _importance_rows_sync(uids):
+    """Top memories by importance for each participant, plus the
+    bot's, in one round trip."""
+    with _stage_connection() as conn:
+        return conn.execute(
+            text(_IMPORTANCE_SQL),
+            {"uids": list(uids), "lim": IMPORTANCE_LIMIT}
+        ).fetchall()
+
+
+def _memory_rows_sync(table_name, ids):
+    """Memory rows by id, for search hits outside the importance
+    set."""
+    if table_name == 'user_memories':
+        columns = "id, user_id, user_name, NULL AS category, fact"
+    else:
+        columns = "id, NULL, NULL, category, fact"
+    with _stage_connection() as conn:
+        return conn.execute(
+            text(
+                f"SELECT {columns} FROM {table_name} "
+                f"WHERE id = ANY(:ids)"
+            ),
+            {"ids": list(ids)}
+        ).fetchall()
+
+
+def _channel_summaries_sync(channel_id):
+    """The channel's newest episodes plus its latest rollup at each
+    level, newest first. Finer levels cover the recent past and
+    coarser ones what came before, since older rows get compacted."""
+    with _stage_connection() as conn:
+        return conn.execute(
+            text(
+                "SELECT id, summary, ended_at, level FROM ("
+                "  SELECT id, summary, ended_at, level, row_number() "
+                "    OVER (PARTITION BY level ORDER BY ended_at DESC) "
+                "    AS rn "
+                "  FROM episodic_summaries WHERE channel_id = :cid"
+                ") s "
+                "WHERE rn <= CASE level WHEN 'episode' THEN :lim "
+                "  ELSE 1 END "
+                "ORDER BY ended_at DESC"
+            ),
+            {"cid": str(channel_id), "lim": CHANNEL_SUMMARY_LIMIT}
+        ).fetchall()
+
+
+def _summary_rows_sync(ids):
+    with _stage_connection() as conn:
+        return conn.execute(
+            text(
+                "SELECT id, summary, ended_at, level "
+                "FROM episodic_summaries WHERE id = ANY(:ids)"
+            ),
+            {"ids": list(ids)}
+        ).fetchall()
+
+
+# Share of the retrieval budget, counted from the start of the
+# response, by which each stage has to be done
+STAGE_DEADLINES = {
+    'embed': 0.3,
+    'importance': 0.6,
+    'channel_summaries': 0.6,
+    'speculation': 0.8,
+    'search_user': 0.8,
+    'search_bot': 0.8,
+    'search_summaries': 0.8,
+}
+
+
+class RetrievalDeadline:
+    """Latency budget for one response's retrieval.
+
+    Every stage gets a sub-deadline at its STAGE_DEADLINES share of
+    the budget (the whole budget if unlisted). A stage that overruns
+    yields its default and is recorded in degraded, so the prompt
+    goes out with whatever tiers were ready.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.degraded = []
+
+    def remaining(self, stage):
+        share = STAGE_DEADLINES.get(stage, 1.0)
+        return max(
+            0.0,
+            self.started + share * self.budget - time.monotonic()
+        )
+
+
+async def timed(timings, stage, aw, default=None, deadline=None):
+    """Await aw, recording its wall time in ms under timings[stage].
+    A failed stage is logged and yields default, as does one that
+    misses its sub-deadline. Database queries made by the stage
+    through _stage_connection get the remaining time as their
+    statement timeout; embedding can't be interrupted and just
+    finishes in the background."""
+    start = time.perf_counter()
+    token = None
+    try:
+        if deadline is None:
+            return await aw
+        remaining = deadline.remaining(stage)
+        # wait_for runs aw in a task, which copies the context as it
+        # is now, so queries in this stage get the timeout
+        token = _stage_timeout.set(max(1, remaining * 1000))
+        try:
+            return await asyncio.wait_for(aw, remaining)
+        except asyncio.TimeoutError:
+            deadline.degraded.append(stage)
+            return default
+    except Exception as e:
+        logger.error(f"Retrieval stage {stage} failed: {e}")
+        return default
+    finally:
+        if token is not None:
+            _stage_timeout.reset(token)
+        timings[stage] = (time.perf_counter() - start) * 1000
+
+
+def _memory_line(row, participants):
+    source, _id, user_id, user_name, category, fact = row[:6]
+    if source == 'bot':
+        return f"- [{category}] {fact}"
+    name = participants.get(user_id, user_name)
+    if len(row) > 6 and row[6] == 3:
+        return f"- About {name} (importance: high): {fact}"
+    return f"- About {name}: {fact}"
+
+
 async def retrieve_memories(db, participants, history,
-                            channel_id):
+                            channel_id, timings=None, deadline=None):
     """Build token-budgeted memory lines for the system prompt.
 
+    Independent stages run concurrently: the importance query, the
+    channel's recent summaries, and (once the conversation is
+    embedded) the searches over the three tables. Search hits that
+    still need their rows are then fetched in one batch per table.
+    Each stage's wall time is recorded in timings. With a
+    RetrievalDeadline, stages that overrun are dropped (leaving,
+    say, importance-only memories) and listed in
+    deadline.degraded.
+
     Returns (memory_lines, summary_lines) where each is a list
     of formatted strings ready for injection.
     """
-    from database.orm import UserMemory, BotMemory
-
-    MEMORY_BUDGET = 1000
-    SUMMARY_BUDGET = 500
-    memory_lines = []
-    token_count = 0
+    if timings is None:
+        timings = {}
+    query_text = "\n".join(conversation_lines(history))
+
+    async def searches():
+        conv_vec = await timed(
+            timings, 'embed',
+            get_conversation_embedding(history),
+            None, deadline
+        )
+        return await asyncio.gather(
+            timed(timings, 'search_user', search_memories(
+                db, 'user_memories', conv_vec, query_text, 15
+            ), [], deadline),
+            timed(timings, 'search_bot', search_memories(
+                db, 'bot_memories', conv_vec, query_text, 15
+            ), [], deadline),
+            timed(timings, 'search_summaries', search_memories(
+                db, 'episodic_summaries', conv_vec, query_text, 5
+            ), [], deadline),
+        )
 
-    # Get conversation embedding for vector search
-    conv_vec = await get_conversation_embedding(
-        channel_id, history
+    importance, channel_rows, (user_ids, bot_ids, summary_ids) = (
+        await asyncio.gather(
+            timed(timings, 'importance', asyncio.to_thread(
+                _importance_rows_sync, participants.keys()
+            ), [], deadline),
+            timed(timings, 'channel_summaries', asyncio.to_thread(
+                _channel_summaries_sync, channel_id
+            ), [], deadline),
+            searches(),
+        )
     )
 
-    # --- Tier 1: Core facts ---
+    # Fetch search hits that the first stages didn't return
+    known = {(row[0], row[1]) for row in importance}
+    missing_user = [i for i in user_ids if ('user', i) not in known]
+    missing_bot = [i for i in bot_ids if ('bot', i) not in known]
+    known_summaries = {row[0] for row in channel_rows}
+    missing_summaries = [
+        i for i in summary_ids if i not in known_summaries
+    ]
 
-    # Importance-sorted user memories
-    importance_rows = {}  # id -> (line, importance)
-    for uid, name in participants.items():
-        try:
-            rows = await asyncio.to_thread(
-                lambda u=uid: db.query(UserMemory)
-                .filter(UserMemory.user_id == u)
-                .order_by(
-                    UserMemory.importance.desc(),
-                    UserMemory.updated_at.desc()
-                )
-                .limit(50)
-                .all()
-            )
-            for row in rows:
-                imp = row.importance or 2
-                if imp == 3:
-                    line = (
-                        f"- About {name} "
-                        f"(importance: high): {row.fact}"
-                    )
-                else:
-                    line = f"- About {name}: {row.fact}"
-                importance_rows[row.id] = (line, imp, 'user')
-        except Exception as e:
-            logger.error(
-                f"Error fetching user memories for {uid}: {e}"
-            )
+    async def no_rows():
+        return []
 
-    # Importance-sorted bot memories
-    try:
-        bot_rows = await asyncio.to_thread(
-            lambda: db.query(BotMemory)
-            .order_by(
-                BotMemory.importance.desc(),
-                BotMemory.updated_at.desc()
-            )
-            .limit(50)
-            .all()
+    def fetch(stage, fn, *args):
+        if not args[-1]:
+            return no_rows()
+        return timed(
+            timings, stage, asyncio.to_thread(fn, *args), [], deadline
         )
-        for row in bot_rows:
-            line = f"- [{row.category}] {row.fact}"
-            importance_rows[('bot', row.id)] = (
-                line, row.importance or 2, 'bot'
-            )
-    except Exception as e:
-        logger.error(f"Error fetching bot memories: {e}")
-
-    # Vector-retrieved IDs
-    vec_user_ids = set()
-    vec_bot_ids = set()
-    if conv_vec:
-        vec_user_ids = set(await vector_search(
-            db, 'user_memories', conv_vec, 15
-        ))
-        vec_bot_ids = set(await vector_search(
-            db, 'bot_memories', conv_vec, 15
-        ))
 
-    # Merge: importance-3 first, then vector-top, then
+    extra_user, extra_bot, similar_rows = await asyncio.gather(
+        fetch('hydrate_user', _memory_rows_sync, 'user_memories',
+              missing_user),
+        fetch('hydrate_bot', _memory_rows_sync, 'bot_memories',
+              missing_bot),
+        fetch('hydrate_summaries', _summary_rows_sync,
+              missing_summaries),
+    )
+
+    # Merge: importance-3 first, then search hits, then
     # importance-2, then importance-1
-    seen_ids = set()
+    vec_keys = {('user', i) for i in user_ids}
+    vec_keys |= {('bot', i) for i in bot_ids}
     buckets = {3: [], 'vec': [], 2: [], 1: []}
-
-    for key, (line, imp, source) in importance_rows.items():
-        row_id = key if source == 'user' else key[1]
-        full_key = (source, row_id)
-
-        is_vec = (
-            (source == 'user' and row_id in vec_user_ids) or
-            (source == 'bot' and row_id in vec_bot_ids)
-        )
-
+    for row in importance:
+        key = (row[0], row[1])
+        imp = row[6] or 2
         if imp == 3:
-            buckets[3].append((full_key, line))
-        elif is_vec:
-            buckets['vec'].append((full_key, line))
-        elif imp == 2:
-            buckets[2].append((full_key, line))
+            bucket = 3
+        elif key in vec_keys:
+            bucket = 'vec'
         else:
-            buckets[1].append((full_key, line))
-
-    # Also add vector results not in importance_rows
-    # (could be lower importance but semantically relevant)
-    for vid in vec_user_ids:
-        fk = ('user', vid)
-        all_keys = {
-            b[0] for bucket in buckets.values()
-            for b in bucket
-        }
-        if fk not in all_keys:
-            # Fetch the row
-            try:
-                row = await asyncio.to_thread(
-                    lambda v=vid: db.query(UserMemory)
-                    .filter(UserMemory.id == v).first()
-                )
-                if row:
-                    name = participants.get(
-                        row.user_id, row.user_name
-                    )
-                    line = f"- About {name}: {row.fact}"
-                    buckets['vec'].append((fk, line))
-            except Exception:
-                pass
-
-    for vid in vec_bot_ids:
-        fk = ('bot', vid)
-        all_keys = {
-            b[0] for bucket in buckets.values()
-            for b in bucket
-        }
-        if fk not in all_keys:
-            try:
-                row = await asyncio.to_thread(
-                    lambda v=vid: db.query(BotMemory)
-                    .filter(BotMemory.id == v).first()
-                )
-                if row:
-                    line = f"- [{row.category}] {row.fact}"
-                    buckets['vec'].append((fk, line))
-            except Exception:
-                pass
+            bucket = 2 if imp == 2 else 1
+        buckets[bucket].append((key, _memory_line(row, participants)))
+
+    # Search hits outside the importance set (could be lower
+    # importance but semantically relevant), in search order
+    extra = {('user', row[0]): row for row in extra_user}
+    extra.update({('bot', row[0]): row for row in extra_bot})
+    for key in [('user', i) for i in user_ids] + [
+            ('bot', i) for i in bot_ids]:
+        row = extra.get(key)
+        if row is not None:
+            buckets['vec'].append(
+                (key, _memory_line((key[0],) + tuple(row), participants))
+            )
 
     # Assemble with budget
+    memory_lines = []
+    token_count = 0
+    seen = set()
     for bucket_key in [3, 'vec', 2, 1]:
-        for full_key, line in buckets[bucket_key]:
-            if full_key in seen_ids:
+        for key, line in buckets[bucket_key]:
+            if key in seen:
                 continue
             cost = estimate_tokens(line)
             if token_count + cost > MEMORY_BUDGET:
                 continue
             memory_lines.append(line)
             token_count += cost
-            seen_ids.add(full_key)
+            seen.add(key)
 
     # --- Tier 2: Episodic summaries ---
-    summary_lines = await retrieve_summaries(
-        db, channel_id, participants, conv_vec,
-        SUMMARY_BUDGET
+    similar = {row[0]: row for row in similar_rows}
+    summary_lines = _summary_lines(
+        channel_rows,
+        [similar[i] for i in summary_ids if i in similar],
+        SUMMARY_BUDGET,
     )
 
+    logger.debug(
+        "Retrieval stages (ms): " + ", ".join(
+            f"{stage}={ms:.0f}" for stage, ms in timings.items()
+        )
+    )
     return memory_lines, summary_lines
 
 
-async def retrieve_summaries(db, channel_id, participants,
-                             conv_vec, budget):
-    """Retrieve episodic summaries with token budget."""
-    from database.orm import EpisodicSummary
-
+def _summary_lines(channel_rows, similar_rows, budget):
+    """Recent summaries from this channel, then similar ones from
+    any channel, within a token budget."""
     lines = []
     token_count = 0
     seen_ids = set()
-
-    # Recent from current channel
-    try:
-        channel_rows = await asyncio.to_thread(
-            lambda: db.query(EpisodicSummary)
-            .filter(EpisodicSummary.channel_id == str(
-                channel_id))
-            .order_by(EpisodicSummary.ended_at.desc())
-            .limit(3)
-            .all()
-        )
-        for row in channel_rows:
-            age = _format_age(row.ended_at)
-            line = f"- In this channel ({age}): {row.summary}"
+    for rows, where in [
+        (channel_rows, "In this channel"),
+        (similar_rows, "In another channel"),
+    ]:
+        for sid, summary, ended_at, level in rows:
+            if sid in seen_ids:
+                continue
+            span = f", over the {level}" if level != 'episode' else ""
+            line = (
+                f"- {where}{span} ({_format_age(ended_at)}): "
+                f"{summary}"
+            )
             cost = estimate_tokens(line)
             if token_count + cost > budget:
                 break
             lines.append(line)
             token_count += cost
-            seen_ids.add(row.id)
-    except Exception as e:
-        logger.error(f"Error fetching channel summaries: {e}")
+            seen_ids.add(sid)
+    return lines
+
+
+# --- Existing-memory context for extraction ---
+
+# Memories per participant and bot memories offered to extraction,
+# most relevant first, and the token budget they share
+EXTRACTION_CONTEXT_PER_USER = 10
+EXTRACTION_CONTEXT_BOT = 10
+EXTRACTION_CONTEXT_BUDGET = 800
+# Lines per embedded chunk of an extraction window; a chunk stays
+# well inside the model's 256-token input
+EXTRACTION_CHUNK_LINES = CONVERSATION_WINDOW
+
+_EXTRACTION_CONTEXT_SQL = (
+    "SELECT q.uid, m.fact, m.rank FROM "
+    "unnest(CAST(:uids AS text[])) AS q(uid) "
+    "CROSS JOIN LATERAL ("
+    "  SELECT fact, row_number() OVER ({order}) AS rank "
+    "  FROM user_memories WHERE user_id = q.uid "
+    "  {order} LIMIT :user_k"
+    ") m "
+    "UNION ALL "
+    "SELECT NULL, '[' || category || ']: ' || fact, rank FROM ("
+    "  SELECT category, fact, row_number() OVER ({order}) AS rank "
+    "  FROM bot_memories {order} LIMIT :bot_k"
+    ") b"
+)
+
+
+async def embed_window_chunks(lines):
+    """Embed a whole extraction window as chunks of
+    EXTRACTION_CHUNK_LINES lines, in one model call.
+
+    A window can run to 30+ lines, more than one embedding holds, so
+    relevance to it is the best match over its chunks. Returns a
+    list of vectors, or None.
+    """
+    chunks = [
+        "\n".join(lines[i:i + EXTRACTION_CHUNK_LINES])
+        for i in range(0, len(lines), EXTRACTION_CHUNK_LINES)
+    ]
+    return await embed_texts(chunks)
+
 
-    # Vector-similar from any channel
-    if conv_vec:
-        vec_ids = await vector_search(
-            db, 'episodic_summaries', conv_vec, 5
+def _extraction_context_sync(uids, query_vecs, user_k, bot_k):
+    from database.database import engine
+    params = {"uids": list(uids), "user_k": user_k, "bot_k": bot_k}
+    if query_vecs:
+        # Nearest to any chunk first; LEAST skips NULLs, so rows
+        # without an embedding sort last
+        dists = ", ".join(
+            f"embedding <=> :vec{i}" for i in range(len(query_vecs))
         )
-        for sid in vec_ids:
-            if sid in seen_ids:
-                continue
-            try:
-                row = await asyncio.to_thread(
-                    lambda s=sid: db.query(EpisodicSummary)
-                    .filter(EpisodicSummary.id == s).first()
-                )
-                if not row:
-                    continue
-                age = _format_age(row.ended_at)
-                line = (
-                    f"- In another channel ({age}): "
-                    f"{row.summary}"
-                )
-                cost = estimate_tokens(line)
-                if token_count + cost > budget:
-                    break
-                lines.append(line)
-                token_count += cost
-                seen_ids.add(row.id)
-            except Exception:
-                pass
+        order = f"ORDER BY LEAST({dists}), updated_at DESC"
+        for i, vec in enumerate(query_vecs):
+            params[f"vec{i}"] = (
+                "[" + ",".join(str(v) for v in vec) + "]"
+            )
+    else:
+        order = "ORDER BY updated_at DESC"
+    sql = _EXTRACTION_CONTEXT_SQL.format(order=order)
+    with engine.begin() as conn:
+        return conn.execute(text(sql), params).fetchall()
+
+
+async def select_extraction_context(participants, query_vecs,
+                                    budget=EXTRACTION_CONTEXT_BUDGET):
+    """Existing memories to show the extraction prompt.
 
+    participants maps user id to display name. Takes the memories
+    nearest any of query_vecs for each participant and for the bot
+    (most recent when there are none), then fills the token budget
+    round-robin by rank so every participant gets their best
+    matches in before anyone's weaker ones.
+    """
+    try:
+        rows = await asyncio.to_thread(
+            _extraction_context_sync, participants.keys(), query_vecs,
+            EXTRACTION_CONTEXT_PER_USER, EXTRACTION_CONTEXT_BOT
+        )
+    except Exception as e:
+        logger.error(f"Error fetching extraction context: {e}")
+        return []
+
+    ranked = []
+    for uid, fact, rank in rows:
+        if uid is None:
+            line = f"Bot {fact}"
+        else:
+            line = f"About {participants[uid]} (id:{uid}): {fact}"
+        # Bot memories interleave as one more participant
+        ranked.append((rank, uid is None, line))
+    ranked.sort()
+
+    lines = []
+    token_count = 0
+    for _rank, _is_bot, line in ranked:
+        cost = estimate_tokens(line)
+        if token_count + cost > budget:
+            continue
+        lines.append(line)
+        token_count += cost
     return lines
 
 
@@ -419,32 +827,50 @@ def _format_age(dt):
 
 # --- Episodic summarization ---
 
-async def summarize_episode(client, messages, channel_id, db):
-    """Summarize a conversation episode and store it."""
+class EpisodeMessage:
+    """One message of an episode awaiting summarization."""
+
+    __slots__ = ('id', 'author', 'author_id', 'content', 'is_bot',
+                 'timestamp')
+
+    def __init__(self, id, author, author_id, content, is_bot,
+                 timestamp):
+        self.id = id  # Discord message id
+        self.author = author
+        self.author_id = author_id
+        self.content = content
+        self.is_bot = is_bot
+        self.timestamp = timestamp
+
+
+async def summarize_episode(llm, messages, channel_id, db):
+    """Summarize a conversation episode and store it.
+
+    llm is the shared LLMScheduler; the call runs at background
+    priority.
+    """
     from database.orm import EpisodicSummary
 
     if not messages or len(messages) < 5:
         return
 
     # Check bot participation
-    bot_participated = any(
-        msg.get('is_bot', False) for msg in messages
-    )
+    bot_participated = any(msg.is_bot for msg in messages)
     if not bot_participated:
         return
 
     convo_text = "\n".join(
-        f"{msg['author']}: {msg['content']}"
-        for msg in messages if msg['content'].strip()
+        f"{msg.author}: {msg.content}"
+        for msg in messages if msg.content.strip()
     )
 
     participant_ids = list(set(
-        msg['author_id'] for msg in messages
-        if not msg.get('is_bot', False)
+        msg.author_id for msg in messages if not msg.is_bot
     ))
 
     try:
-        response = await client.messages.create(
+        response = await llm.create(
+            PRIORITY_BACKGROUND, 'episode_summary',
             model="claude-haiku-4-5-20251001",
             max_tokens=200,
             system=(
@@ -463,8 +889,8 @@ async def summarize_episode(client, messages, channel_id, db):
         logger.error(f"Episode summarization failed: {e}")
         return
 
-    started_at = messages[0].get('timestamp')
-    ended_at = messages[-1].get('timestamp')
+    started_at = messages[0].timestamp
+    ended_at = messages[-1].timestamp
 
     try:
         new_summary = EpisodicSummary(
@@ -477,23 +903,12 @@ async def summarize_episode(client, messages, channel_id, db):
         )
         db.add(new_summary)
         db.commit()
+        memory_blocks.bump_global()
         logger.info(
             f"Episodic summary stored for channel "
             f"{channel_id}: {summary[:80]}..."
         )
 
-        # Enforce cap: 200 summaries
-        count = db.query(EpisodicSummary).count()
-        if count > 200:
-            oldest = (
-                db.query(EpisodicSummary)
-                .order_by(EpisodicSummary.created_at.asc())
-                .first()
-            )
-            if oldest:
-                db.delete(oldest)
-                db.commit()
-
         # Store embedding in background
         asyncio.create_task(
             store_embedding_for_summary(db, new_summary)
@@ -503,60 +918,295 @@ async def summarize_episode(client, messages, channel_id, db):
         logger.error(f"Error saving episodic summary: {e}")
 
 
-# --- Similarity dedup ---
-
-def _cosine_similarity_sync(db, table_name, row_embedding,
-                            exclude_id=None, threshold=0.85,
-                            filter_col=None, filter_val=None):
-    """Find rows with cosine similarity > threshold."""
+# --- Summary rollups ---
+
+# (child level, parent level, how long a period has to be over
+# before its children are compacted into it)
+ROLLUPS = [
+    ('episode', 'day', '1 day'),
+    ('day', 'week', '1 week'),
+    ('week', 'month', '1 month'),
+]
+# Periods compacted per level on each run
+COMPACTION_BATCH = 20
+
+_ROLLUP_GROUPS_SQL = (
+    "SELECT channel_id, "
+    "  array_agg(id ORDER BY COALESCE(started_at, created_at)), "
+    "  array_agg(summary ORDER BY COALESCE(started_at, created_at)), "
+    "  string_agg(participant_ids, ','), sum(message_count), "
+    "  min(COALESCE(started_at, created_at)), "
+    "  max(COALESCE(ended_at, created_at)) "
+    "FROM episodic_summaries "
+    "WHERE level = :child "
+    "  AND COALESCE(started_at, created_at) < date_trunc(:unit, "
+    "    (now() AT TIME ZONE 'utc') - CAST(:keep AS interval)) "
+    "GROUP BY channel_id, "
+    "  date_trunc(:unit, COALESCE(started_at, created_at)) "
+    "ORDER BY 6 LIMIT :lim"
+)
+
+
+def _rollup_groups_sync(child, unit, keep):
+    """Finished periods of child summaries, one row per channel and
+    period."""
     from database.database import engine
-    vec_str = "[" + ",".join(str(v) for v in row_embedding) + "]"
+    with engine.begin() as conn:
+        return conn.execute(
+            text(_ROLLUP_GROUPS_SQL), {
+                "child": child, "unit": unit, "keep": keep,
+                "lim": COMPACTION_BATCH,
+            }
+        ).fetchall()
 
-    where_clauses = ["embedding IS NOT NULL"]
-    params = {"vec": vec_str, "threshold": threshold}
 
-    if exclude_id is not None:
-        where_clauses.append("id != :exclude_id")
-        params["exclude_id"] = exclude_id
-    if filter_col and filter_val:
-        where_clauses.append(f"{filter_col} = :fval")
-        params["fval"] = filter_val
+def _relevel_sync(row_id, level):
+    from database.database import engine
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "UPDATE episodic_summaries SET level = :level "
+                "WHERE id = :id"
+            ),
+            {"level": level, "id": row_id}
+        )
 
-    where = " AND ".join(where_clauses)
 
+def _store_rollup_sync(channel_id, level, summary, participant_ids,
+                       message_count, started_at, ended_at, vec,
+                       child_ids):
+    """Insert a rollup and delete the rows it replaces, atomically."""
+    from database.database import engine
+    vec_str = (
+        "[" + ",".join(str(v) for v in vec) + "]"
+        if vec is not None else None
+    )
     with engine.begin() as conn:
-        result = conn.execute(
+        conn.execute(
             text(
-                f"SELECT id, 1 - (embedding <=> :vec) as sim "
-                f"FROM {table_name} "
-                f"WHERE {where} "
-                f"AND 1 - (embedding <=> :vec) > :threshold "
-                f"ORDER BY sim DESC LIMIT 5"
-            ),
-            params
+                "INSERT INTO episodic_summaries (channel_id, summary, "
+                "participant_ids, message_count, started_at, ended_at, "
+                "level, embedding) VALUES (:cid, :summary, :pids, "
+                ":count, :started, :ended, :level, :vec)"
+            ), {
+                "cid": channel_id, "summary": summary,
+                "pids": participant_ids, "count": message_count,
+                "started": started_at, "ended": ended_at,
+                "level": level, "vec": vec_str,
+            }
         )
-        return [(row[0], row[1]) for row in result.fetchall()]
+        conn.execute(
+            text("DELETE FROM episodic_summaries WHERE id = ANY(:ids)"),
+            {"ids": list(child_ids)}
+        )
+
+
+async def _rollup(llm, level, group):
+    (channel_id, ids, summaries, participants, message_count,
+     started_at, ended_at) = group
+    if len(ids) == 1:
+        # Nothing to merge; the row just moves up a level
+        await asyncio.to_thread(_relevel_sync, ids[0], level)
+        return
 
+    response = await llm.create(
+        PRIORITY_BACKGROUND, f'{level}_rollup',
+        model="claude-haiku-4-5-20251001",
+        max_tokens=300,
+        system=(
+            f"These are summaries of consecutive conversations in one "
+            f"Discord channel over a {level}. Combine them into a "
+            f"single summary of 2-5 sentences. Keep who was involved, "
+            f"notable events, decisions and running jokes. Be "
+            f"concise."
+        ),
+        messages=[{
+            "role": "user",
+            "content": "\n".join(f"- {s}" for s in summaries),
+        }],
+    )
+    summary = response.content[0].text.strip()
+    vec = await embed_text(summary)
+    participant_ids = ",".join(dict.fromkeys(
+        uid for uid in (participants or "").split(",") if uid
+    ))
+    await asyncio.to_thread(
+        _store_rollup_sync, channel_id, level, summary,
+        participant_ids, message_count, started_at, ended_at, vec, ids
+    )
 
-async def find_similar_memories(db, table_name, fact_text,
-                                user_id=None):
-    """Find memories similar to fact_text (>0.85 cosine sim).
 
-    Returns list of (row_id, similarity_score) tuples,
-    or empty list if no embeddings available.
+async def compact_summaries(llm):
+    """Roll finished periods of summaries up a level: episodes into
+    days, days into weeks, weeks into months. The merged rows are
+    deleted, so a channel's history shrinks as it ages instead of
+    being dropped. Returns how many rollups were made."""
+    made = 0
+    for child, level, keep in ROLLUPS:
+        try:
+            groups = await asyncio.to_thread(
+                _rollup_groups_sync, child, level, keep
+            )
+        except Exception as e:
+            logger.error(f"Reading {child} summaries failed: {e}")
+            continue
+        for group in groups:
+            try:
+                await _rollup(llm, level, group)
+                made += 1
+            except Exception as e:
+                logger.error(
+                    f"Rolling up {len(group[1])} {child} summaries "
+                    f"for channel {group[0]} failed: {e}"
+                )
+    if made:
+        memory_blocks.bump_global()
+        logger.info(f"Compacted summaries into {made} rollup(s)")
+    return made
+
+
+# --- Similarity dedup ---
+
+SIMILARITY_THRESHOLD = 0.85
+
+# Per-table dedup lookup: exact duplicate, nearest neighbour above
+# the threshold, exact-match update target and the cap count.
+# {scope} restricts every subquery to the memory's owner.
+_DEDUP_SQL = (
+    "SELECT CAST('{kind}' AS text) AS kind, q.idx, "
+    "  EXISTS (SELECT 1 FROM {table} d "
+    "    WHERE d.fact = q.fact {scope_d}) AS dup, "
+    "  near.id AS near_id, near.sim AS near_sim, "
+    "  (SELECT u.id FROM {table} u "
+    "    WHERE q.upd IS NOT NULL AND u.fact = q.upd {scope_u} "
+    "    LIMIT 1) AS update_id, "
+    "  (SELECT count(*) FROM {table} c "
+    "    WHERE TRUE {scope_c}) AS total "
+    "FROM (VALUES {values}) AS q(idx, fact, upd, uid, vec) "
+    "LEFT JOIN LATERAL ("
+    "  SELECT m.id, 1 - (m.embedding <=> q.vec) AS sim "
+    "  FROM {table} m "
+    "  WHERE q.vec IS NOT NULL AND m.embedding IS NOT NULL "
+    "  {scope_m} "
+    "  ORDER BY m.embedding <=> q.vec LIMIT 1"
+    ") near ON near.sim > :threshold"
+)
+
+
+def _dedup_lookup_sync(user_items, bot_items, threshold):
+    from database.database import engine
+    vec_type = f"{VECTOR_STORAGE}(384)"
+    params = {"threshold": threshold}
+    selects = []
+    for kind, table, items in [
+        ('user', 'user_memories', user_items),
+        ('bot', 'bot_memories', bot_items),
+    ]:
+        if not items:
+            continue
+        values = []
+        for i, item in enumerate(items):
+            p = f"{kind}{i}"
+            values.append(
+                f"({i}, CAST(:{p}_fact AS text), "
+                f"CAST(:{p}_upd AS text), CAST(:{p}_uid AS text), "
+                f"CAST(:{p}_vec AS {vec_type}))"
+            )
+            vec = item.get('vec')
+            params.update({
+                f"{p}_fact": item['fact'],
+                f"{p}_upd": item.get('update') or None,
+                f"{p}_uid": item.get('uid'),
+                f"{p}_vec": (
+                    "[" + ",".join(str(v) for v in vec) + "]"
+                    if vec else None
+                ),
+            })
+        scopes = {
+            f"scope_{alias}": (
+                f"AND {alias}.user_id = q.uid"
+                if kind == 'user' else ""
+            )
+            for alias in ('d', 'u', 'c', 'm')
+        }
+        selects.append(_DEDUP_SQL.format(
+            kind=kind, table=table, values=", ".join(values),
+            **scopes
+        ))
+
+    results = {'user': {}, 'bot': {}}
+    if not selects:
+        return results
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(" UNION ALL ".join(selects)), params
+        ).fetchall()
+    for kind, idx, dup, near_id, near_sim, update_id, total in rows:
+        results[kind][idx] = {
+            'dup': dup,
+            'similar': (
+                (near_id, near_sim) if near_id is not None else None
+            ),
+            'update_id': update_id,
+            'total': total,
+        }
+    return results
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return dot / norm if norm else 0.0
+
+
+def dedup_within_batch(items, scope=None,
+                       threshold=SIMILARITY_THRESHOLD):
+    """Drop items that repeat an earlier item of the same batch.
+
+    The database lookup only compares items against stored rows, so
+    two near-identical facts from one extraction would otherwise both
+    be inserted. An item is a repeat if its fact matches, or its
+    embedding is within threshold of, an earlier kept item with the
+    same scope key (e.g. 'uid'). The kept item takes the higher
+    importance of the two. Returns the kept items in order.
     """
-    vec = await embed_text(fact_text)
-    if vec is None:
-        return []
-    try:
-        filter_col = 'user_id' if user_id else None
-        return await asyncio.to_thread(
-            _cosine_similarity_sync, db, table_name, vec,
-            None, 0.85, filter_col, user_id
+    kept = []
+    for item in items:
+        match = None
+        for other in kept:
+            if scope and item.get(scope) != other.get(scope):
+                continue
+            if item['fact'] == other['fact'] or (
+                item.get('vec') and other.get('vec')
+                and _cosine(item['vec'], other['vec']) > threshold
+            ):
+                match = other
+                break
+        if match is None:
+            kept.append(item)
+            continue
+        match['importance'] = max(
+            match.get('importance') or 2, item.get('importance') or 2
         )
-    except Exception as e:
-        logger.error(f"Similarity search failed: {e}")
-        return []
+        logger.debug(
+            f"Dropped in-batch duplicate memory: {item['fact']} "
+            f"(same as: {match['fact']})"
+        )
+    return kept
+
+
+async def find_duplicates_batch(user_items, bot_items,
+                                threshold=SIMILARITY_THRESHOLD):
+    """Dedup lookup for a whole extraction result in one query.
+
+    Items are dicts with 'fact', optional 'update', 'uid' (user
+    items) and 'vec' (embedding or None). Returns
+    {'user': {idx: info}, 'bot': {idx: info}} where info has 'dup',
+    'similar' ((row_id, sim) or None), 'update_id' and 'total'.
+    """
+    return await asyncio.to_thread(
+        _dedup_lookup_sync, user_items, bot_items, threshold
+    )
 
 
 # --- Backfill ---
@@ -609,4 +1259,5 @@ async def backfill_embeddings(db):
             )
 
     if count > 0:
+        memory_blocks.bump_global()
         logger.info(f"Backfilled {count} embeddings")
@@ -0,0 +1,131 @@
+"""
+Per-channel ring buffers of recent messages.
+
+Fed from gateway events (new, edited and deleted messages) so that
+assembling conversation history is a memory read instead of a
+rate-limited channel.history() REST call. A channel is "cold" until
+its buffer has been seeded from REST once.
+"""
+from collections import deque
+
+from cogs.state_store import TTLMap
+
+HISTORY_SIZE = 20
+# Channels with no new message for this long are dropped and go
+# cold again
+HISTORY_TTL = 6 * 3600
+MAX_CHANNELS = 512
+
+
+class MessageRecord:
+    """Compact record of the message fields the chat pipeline uses."""
+
+    __slots__ = (
+        'id', 'channel_id', 'author_id', 'author_name', 'is_bot',
+        'content', 'created_at', 'reply_to_author_id',
+    )
+
+    def __init__(self, id, channel_id, author_id, author_name,
+                 is_bot, content, created_at, reply_to_author_id=None):
+        self.id = id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.is_bot = is_bot
+        self.content = content
+        self.created_at = created_at
+        # Author of the message this one replies to, when known
+        self.reply_to_author_id = reply_to_author_id
+
+    @classmethod
+    def from_message(cls, message):
+        reference = message.reference
+        replied = reference.resolved if reference is not None else None
+        replied_author = getattr(replied, 'author', None)
+        return cls(
+            message.id,
+            message.channel.id,
+            message.author.id,
+            message.author.display_name,
+            message.author.bot,
+            message.content,
+            message.created_at,
+            replied_author.id if replied_author is not None else None,
+        )
+
+
+class MessageBuffer:
+    """Bounded per-channel history, newest message last."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        # channel_id -> deque of MessageRecord
+        self._channels = TTLMap(
+            'history', HISTORY_TTL, MAX_CHANNELS,
+            on_expire=lambda channel_id, _records:
+                self._warm.discard(channel_id)
+        )
+        self._warm = set()
+
+    def is_warm(self, channel_id):
+        # Reading the map first lets an expired channel go cold
+        return (
+            channel_id in self._channels and channel_id in self._warm
+        )
+
+    def track(self, channel_id):
+        """Start buffering a channel ahead of seeding it, so that
+        messages arriving during the REST fetch aren't lost."""
+        if channel_id not in self._channels:
+            self._channels[channel_id] = deque(maxlen=self.size)
+
+    def seed(self, channel_id, messages):
+        """Merge REST-fetched messages into the buffer, mark warm."""
+        self.track(channel_id)
+        buffered = self._channels[channel_id]
+        by_id = {record.id: record for record in buffered}
+        for message in messages:
+            by_id.setdefault(
+                message.id, MessageRecord.from_message(message)
+            )
+        # Snowflake IDs are time-ordered
+        buffered.clear()
+        buffered.extend(sorted(by_id.values(), key=lambda r: r.id))
+        self._warm.add(channel_id)
+
+    def append(self, message):
+        buffered = self._channels.get(message.channel.id)
+        if buffered is not None:
+            buffered.append(MessageRecord.from_message(message))
+            self._channels.touch(message.channel.id)
+
+    def edit(self, channel_id, message_id, content):
+        buffered = self._channels.get(channel_id)
+        if buffered is None:
+            return
+        for record in buffered:
+            if record.id == message_id:
+                record.content = content
+                return
+
+    def delete(self, channel_id, message_id):
+        buffered = self._channels.get(channel_id)
+        if buffered is None:
+            return
+        for record in buffered:
+            if record.id == message_id:
+                buffered.remove(record)
+                return
+
+    def recent(self, channel_id, limit=None):
+        """Buffered records, oldest first."""
+        records = list(self._channels.get(channel_id, ()))
+        if limit is not None:
+            records = records[-limit:]
+        return records
+
+    def invalidate(self):
+        """Mark every channel cold, e.g. after missing gateway
+        events during a reconnect."""
+        self._channels.clear()
+        self._warm.clear()
@@ -0,0 +1,268 @@
+"""
+Offline embedding model artifacts.
+
+Stages the sentence-transformers model into a plain directory with
+safetensors weights and a SHA-256 manifest, then loads it back with
+no network access. Weights are memory-mapped read-only, so every
+bot container on a host shares the same pages via the OS page cache.
+
+Pre-stage an artifact (the Docker build does this):
+
+    python cogs/model_store.py /app/models/all-MiniLM-L6-v2
+
+Staging hashes every file and records each one's size and mtime in a
+stamp file. Loading only compares those stamps; files are re-hashed
+only when a stamp is missing or doesn't match.
+"""
+import os
+import sys
+import json
+import mmap
+import hashlib
+import logging
+import warnings
+
+logger = logging.getLogger('bangabot')
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+WEIGHTS_FILE = 'model.safetensors'
+MANIFEST_FILE = 'bangabot-manifest.json'
+# Size and mtime of every file as of the last full hash check
+STAMP_FILE = 'bangabot-verified.json'
+
+_SAFETENSORS_DTYPES = {
+    'F64': 'float64',
+    'F32': 'float32',
+    'F16': 'float16',
+    'BF16': 'bfloat16',
+    'I64': 'int64',
+    'I32': 'int32',
+    'I16': 'int16',
+    'I8': 'int8',
+    'U8': 'uint8',
+    'BOOL': 'bool',
+}
+
+# Keep mappings alive for as long as the tensors that view them
+_mapped_files = []
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifact_files(model_dir):
+    """Relative paths of every artifact file except the manifest."""
+    files = []
+    for root, _dirs, names in os.walk(model_dir):
+        for name in names:
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, model_dir)
+            if rel not in (MANIFEST_FILE, STAMP_FILE):
+                files.append(rel)
+    return sorted(files)
+
+
+def _stat_stamp(model_dir, rels):
+    stamp = {}
+    for rel in rels:
+        st = os.stat(os.path.join(model_dir, rel))
+        stamp[rel] = [st.st_size, st.st_mtime_ns]
+    return stamp
+
+
+def _read_stamp(model_dir):
+    try:
+        with open(os.path.join(model_dir, STAMP_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_stamp(model_dir, stamp):
+    try:
+        with open(os.path.join(model_dir, STAMP_FILE), 'w') as f:
+            json.dump(stamp, f, indent=2, sort_keys=True)
+    except OSError as e:
+        # Read-only artifact directory: verify in full every time
+        logger.warning(f"Could not write model verification stamp: {e}")
+
+
+def stage_model(model_dir, model_name=DEFAULT_MODEL_NAME):
+    """Download the model once and write it as a local artifact.
+
+    Returns the SHA-256 of the weights file, suitable for pinning
+    via EMBEDDING_MODEL_SHA256.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    os.makedirs(model_dir, exist_ok=True)
+    model.save(model_dir, safe_serialization=True)
+
+    weights_path = os.path.join(model_dir, WEIGHTS_FILE)
+    if not os.path.exists(weights_path):
+        raise RuntimeError(
+            f"Staged model has no {WEIGHTS_FILE} in {model_dir}"
+        )
+
+    manifest = {
+        "model_name": model_name,
+        "files": {
+            rel: _sha256(os.path.join(model_dir, rel))
+            for rel in _artifact_files(model_dir)
+        },
+    }
+    with open(os.path.join(model_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest["files"][WEIGHTS_FILE]
+
+
+def verify_model_dir(model_dir, expected_sha256=None, full=False):
+    """Check every artifact file against the staged manifest.
+
+    Files whose size and mtime still match the stamp from the last
+    full check aren't re-hashed, unless full is set. Raises
+    ValueError if the manifest is missing, a file is missing or
+    modified, or the weights don't match expected_sha256.
+    """
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise ValueError(
+            f"No {MANIFEST_FILE} in {model_dir} - stage the model "
+            f"with cogs/model_store.py first"
+        )
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    files = manifest.get("files", {})
+    if WEIGHTS_FILE not in files:
+        raise ValueError(f"Manifest does not list {WEIGHTS_FILE}")
+    if expected_sha256 and files[WEIGHTS_FILE] != expected_sha256:
+        raise ValueError(
+            f"Manifest weights checksum {files[WEIGHTS_FILE][:12]} "
+            f"does not match pinned {expected_sha256[:12]}"
+        )
+
+    for rel in files:
+        if not os.path.exists(os.path.join(model_dir, rel)):
+            raise ValueError(f"Model artifact missing: {rel}")
+
+    # The manifest is stamped too, so editing it forces a re-hash
+    stamp = _stat_stamp(model_dir, sorted(files) + [MANIFEST_FILE])
+    if not full and _read_stamp(model_dir) == stamp:
+        return
+
+    for rel, checksum in files.items():
+        if _sha256(os.path.join(model_dir, rel)) != checksum:
+            raise ValueError(f"Model artifact checksum mismatch: {rel}")
+    _write_stamp(model_dir, stamp)
+
+
+def _mmap_state_dict(weights_path):
+    """Build a state dict whose tensors view a read-only mmap of
+    the safetensors file instead of private heap copies."""
+    import torch
+
+    with open(weights_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _mapped_files.append(mapped)
+
+    header_len = int.from_bytes(mapped[:8], 'little')
+    header = json.loads(mapped[8:8 + header_len])
+    header.pop('__metadata__', None)
+    data_start = 8 + header_len
+
+    state = {}
+    with warnings.catch_warnings():
+        # frombuffer warns that the buffer is not writable; the
+        # weights are never written during inference
+        warnings.simplefilter('ignore', UserWarning)
+        for name, info in header.items():
+            dtype = getattr(torch, _SAFETENSORS_DTYPES[info['dtype']])
+            shape = info['shape']
+            numel = 1
+            for dim in shape:
+                numel *= dim
+            if numel == 0:
+                state[name] = torch.empty(shape, dtype=dtype)
+                continue
+            start, _end = info['data_offsets']
+            tensor = torch.frombuffer(
+                mapped, dtype=dtype, count=numel,
+                offset=data_start + start
+            )
+            state[name] = tensor.reshape(shape)
+    return state
+
+
+def _map_weights(model, weights_path):
+    """Swap the transformer's weights for mmap-backed tensors."""
+    transformer = model[0].auto_model
+    state = _mmap_state_dict(weights_path)
+    try:
+        result = transformer.load_state_dict(
+            state, strict=False, assign=True
+        )
+    except TypeError:
+        # assign= needs torch >= 2.1; the private copies still work
+        logger.warning(
+            "torch too old to memory-map embedding weights, "
+            "using private copies"
+        )
+        return
+    if result.unexpected_keys:
+        logger.warning(
+            f"Embedding weights not memory-mapped: "
+            f"{len(result.unexpected_keys)} unexpected keys"
+        )
+
+
+def force_offline():
+    """Never fall through to the Hugging Face hub for a staged model.
+
+    huggingface_hub reads these once, when it is first imported, so
+    this has to run before anything imports it (memory_manager calls
+    it at import time when EMBEDDING_MODEL_PATH is set).
+    """
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+
+def load_model(model_dir, expected_sha256=None):
+    """Load a staged model with no network access."""
+    verify_model_dir(model_dir, expected_sha256)
+
+    force_offline()
+    hub = sys.modules.get('huggingface_hub.constants')
+    if hub is not None and not getattr(hub, 'HF_HUB_OFFLINE', True):
+        logger.warning(
+            "huggingface_hub was imported before offline mode was "
+            "set; the staged model may still reach the network"
+        )
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_dir, device='cpu')
+    _map_weights(model, os.path.join(model_dir, WEIGHTS_FILE))
+    return model
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(
+            "Usage: python cogs/model_store.py <model_dir> "
+            "[model_name]"
+        )
+        sys.exit(1)
+    target = sys.argv[1]
+    name = sys.argv[2] if len(sys.argv) == 3 else DEFAULT_MODEL_NAME
+    checksum = stage_model(target, name)
+    # Full hash at build time; also writes the stamp startup checks
+    verify_model_dir(target, checksum, full=True)
+    print(f"Staged {name} in {target}")
+    print(f"EMBEDDING_MODEL_SHA256={checksum}")
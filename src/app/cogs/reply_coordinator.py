@@ -0,0 +1,103 @@
+"""
+Per-channel single-flight for reply generation.
+
+At most one reply is generated per channel at a time. A message that
+arrives while a reply is still being prepared makes that reply stale:
+it is cancelled and restarted against the newer message. Once a reply
+has started posting it runs to completion, and messages arriving in
+the meantime are coalesced into a single follow-up reply.
+
+A coalesced request keeps the ids of every message in it that
+mentioned the bot, so the reply can point its mention hints at those
+messages rather than at whichever one happens to be newest.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger('bangabot')
+
+
+class _ChannelSlot:
+    __slots__ = ('task', 'request', 'sending', 'pending')
+
+    def __init__(self):
+        self.task = None
+        self.request = None
+        self.sending = False
+        self.pending = None
+
+
+def _merge(older, newer):
+    """Coalesce two (message, mention_ids, engaged) requests into one
+    answering the newest message."""
+    if older is None:
+        return newer
+    return (
+        newer[0],
+        older[1] | newer[1],
+        older[2] or newer[2],
+    )
+
+
+class ReplyCoordinator:
+    def __init__(self, generate):
+        # generate(message, mention_ids, engaged) -> coroutine, where
+        # mention_ids holds the ids of messages that mentioned the bot
+        self._generate = generate
+        self._slots = {}  # channel_id -> _ChannelSlot
+
+    def submit(self, message, mentioned, engaged):
+        """Request a reply to message in its channel."""
+        channel_id = message.channel.id
+        mention_ids = frozenset([message.id] if mentioned else [])
+        request = (message, mention_ids, engaged)
+        slot = self._slots.get(channel_id)
+
+        if slot is None:
+            slot = _ChannelSlot()
+            self._slots[channel_id] = slot
+            self._start(channel_id, slot, request)
+        elif not slot.sending:
+            # Nothing posted yet: the newer message makes it stale
+            logger.debug(
+                f"Cancelling stale reply in channel {channel_id}"
+            )
+            slot.task.cancel()
+            self._start(
+                channel_id, slot, _merge(slot.request, request)
+            )
+        else:
+            slot.pending = _merge(slot.pending, request)
+
+    def mark_sending(self, channel_id):
+        """Called before the first post; the reply is no longer
+        cancellable and later messages wait for a follow-up."""
+        slot = self._slots.get(channel_id)
+        if slot is not None:
+            slot.sending = True
+
+    def active_count(self):
+        """Channels with a reply generating or queued."""
+        return len(self._slots)
+
+    def _start(self, channel_id, slot, request):
+        slot.request = request
+        slot.sending = False
+        slot.task = asyncio.create_task(
+            self._run(channel_id, slot, request)
+        )
+
+    async def _run(self, channel_id, slot, request):
+        try:
+            await self._generate(*request)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"Chat cog error: {e}")
+        finally:
+            if slot.task is asyncio.current_task():
+                if slot.pending is not None:
+                    follow_up, slot.pending = slot.pending, None
+                    self._start(channel_id, slot, follow_up)
+                else:
+                    self._slots.pop(channel_id, None)
@@ -0,0 +1,123 @@
+"""
+Write-through cache of user_sentiments.
+
+The table is small and only the bot writes to it, so the whole thing
+is loaded once at startup and every read is a dict lookup. Writes go
+to the database first as a single INSERT ... ON CONFLICT upsert, and
+the row it returns replaces the cached entry.
+"""
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from cogs import memory_blocks
+
+logger = logging.getLogger('bangabot')
+
+SCORE_MIN = -5.0
+SCORE_MAX = 5.0
+
+# Creates the row if missing; an existing row only gets its name
+# refreshed. Either way the current row comes back.
+_ENSURE_SQL = (
+    "INSERT INTO user_sentiments (user_id, user_name, score) "
+    "VALUES (:uid, :name, 0.0) "
+    "ON CONFLICT (user_id) DO UPDATE "
+    "SET user_name = EXCLUDED.user_name "
+    "RETURNING user_id, user_name, score, reason"
+)
+
+# The clamp and rounding happen in the statement, so concurrent
+# updates to one user can't overwrite each other
+_APPLY_SQL = (
+    "INSERT INTO user_sentiments (user_id, user_name, score, reason) "
+    "VALUES (:uid, :name, round(CAST(LEAST(:max, GREATEST(:min, "
+    "  :delta)) AS numeric), 2), :reason) "
+    "ON CONFLICT (user_id) DO UPDATE SET "
+    "  score = round(CAST(LEAST(:max, GREATEST(:min, "
+    "    COALESCE(user_sentiments.score, 0) + :delta)) AS numeric), 2), "
+    "  reason = EXCLUDED.reason, "
+    "  user_name = EXCLUDED.user_name, "
+    "  updated_at = now() "
+    "RETURNING user_id, user_name, score, reason"
+)
+
+
+class Sentiment:
+    __slots__ = ('user_name', 'score', 'reason')
+
+    def __init__(self, user_name, score, reason):
+        self.user_name = user_name
+        self.score = score or 0.0
+        self.reason = reason
+
+
+class SentimentCache:
+    def __init__(self):
+        self._rows = {}  # user_id -> Sentiment
+        self.loaded = False
+
+    @staticmethod
+    def _execute_sync(sql, params=None):
+        from database.database import engine
+        with engine.begin() as conn:
+            return conn.execute(text(sql), params or {}).fetchall()
+
+    def _put(self, row):
+        user_id, user_name, score, reason = row
+        self._rows[user_id] = Sentiment(user_name, score, reason)
+        return self._rows[user_id]
+
+    async def load(self):
+        """Read the whole table into memory."""
+        try:
+            rows = await asyncio.to_thread(
+                self._execute_sync,
+                "SELECT user_id, user_name, score, reason "
+                "FROM user_sentiments"
+            )
+        except Exception as e:
+            logger.error(f"Failed to load sentiment cache: {e}")
+            return
+        self._rows = {}
+        for row in rows:
+            self._put(row)
+        self.loaded = True
+        logger.info(f"Loaded {len(self._rows)} sentiment rows")
+
+    def get(self, user_id):
+        """Cached Sentiment for a user, or None."""
+        return self._rows.get(user_id)
+
+    def score(self, user_id):
+        entry = self._rows.get(user_id)
+        return entry.score if entry is not None else 0.0
+
+    async def ensure(self, user_id, user_name):
+        """Make sure a user has a sentiment row."""
+        if not self.loaded:
+            # Startup load failed; try again off the hot path
+            await self.load()
+        if user_id in self._rows:
+            return self._rows[user_id]
+        rows = await asyncio.to_thread(
+            self._execute_sync, _ENSURE_SQL,
+            {"uid": user_id, "name": user_name}
+        )
+        logger.info(f"Created sentiment row for {user_name}")
+        return self._put(rows[0])
+
+    async def apply_delta(self, user_id, user_name, delta, reason):
+        """Shift a user's score by delta, clamped to the score range.
+        Returns (old_score, new_score)."""
+        old_score = self.score(user_id)
+        rows = await asyncio.to_thread(
+            self._execute_sync, _APPLY_SQL, {
+                "uid": user_id, "name": user_name, "delta": delta,
+                "reason": reason, "min": SCORE_MIN, "max": SCORE_MAX,
+            }
+        )
+        entry = self._put(rows[0])
+        memory_blocks.bump_user(user_id)
+        return old_score, entry.score
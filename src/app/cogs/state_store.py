@@ -0,0 +1,162 @@
+"""
+Bounded in-memory state for long-running cogs.
+
+TTLMap is a dict whose entries expire a fixed time after they were
+last written, with a hard cap on size. Per-channel state that would
+otherwise grow with every channel the bot has ever seen lives in
+these and is swept periodically; deep_sizeof and vector_cache_sizeof
+give rough live memory figures for reporting.
+"""
+import sys
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+
+class TTLMap:
+    """Dict with write-refreshed expiry and a size cap.
+
+    Entries expire ttl seconds after they were last set or touched;
+    plain reads don't extend them. Expired entries are dropped when
+    read and in bulk by sweep(). Past max_size the least recently
+    written entry is evicted. on_expire(key, value) is called for
+    every entry dropped by expiry or eviction, but not by pop().
+    """
+
+    def __init__(self, name, ttl, max_size=1024, on_expire=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.on_expire = on_expire
+        self._data = OrderedDict()  # key -> [expires, value]
+        self.expired = 0
+        self.evicted = 0
+
+    def _drop(self, key):
+        _expires, value = self._data.pop(key)
+        if self.on_expire is not None:
+            self.on_expire(key, value)
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self.expired += 1
+            self._drop(key)
+            return None
+        return entry
+
+    def __setitem__(self, key, value):
+        self._data[key] = [time.monotonic() + self.ttl, value]
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            oldest = next(iter(self._data))
+            self.evicted += 1
+            self._drop(oldest)
+
+    def __getitem__(self, key):
+        entry = self._live(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[1]
+
+    def __contains__(self, key):
+        return self._live(key) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._live(key)
+        return default if entry is None else entry[1]
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def touch(self, key):
+        """Restart an entry's TTL, as if it had just been set."""
+        entry = self._data.get(key)
+        if entry is not None:
+            entry[0] = time.monotonic() + self.ttl
+            self._data.move_to_end(key)
+
+    def items(self):
+        now = time.monotonic()
+        return [
+            (key, entry[1]) for key, entry in self._data.items()
+            if entry[0] > now
+        ]
+
+    def keys(self):
+        return [key for key, _value in self.items()]
+
+    def clear(self):
+        self._data.clear()
+
+    def sweep(self):
+        """Drop every expired entry. Returns how many were dropped."""
+        # Writes move entries to the end and the TTL is fixed, so
+        # entries are in expiry order
+        now = time.monotonic()
+        dropped = 0
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if entry[0] > now:
+                break
+            self._drop(key)
+            dropped += 1
+        self.expired += dropped
+        return dropped
+
+
+def deep_sizeof(obj, _seen=None):
+    """Approximate bytes held by obj and everything it references
+    through containers, __slots__ and __dict__."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, (asyncio.Handle, asyncio.Future)):
+        # Timers and tasks reference the event loop
+        return size
+    if isinstance(obj, TTLMap):
+        return size + deep_sizeof(obj._data, _seen)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, _seen) + deep_sizeof(value, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += deep_sizeof(item, _seen)
+    elif hasattr(obj, '__slots__'):
+        for slot in obj.__slots__:
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), _seen)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), _seen)
+    return size
+
+
+def vector_cache_sizeof(cache):
+    """Approximate bytes held by a dict of equal-length float-list
+    vectors. Sized from one sample vector rather than walked, since
+    the caches hold hundreds of thousands of floats."""
+    size = sys.getsizeof(cache)
+    if not cache:
+        return size
+    sample = next(iter(cache.values()))
+    per_vector = sys.getsizeof(sample) + len(sample) * sys.getsizeof(0.0)
+    keys = sum(deep_sizeof(key) for key in cache)
+    return size + keys + len(cache) * per_vector
+
+
+def format_size(n):
+    for unit in ('B', 'KiB', 'MiB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
@@ -37,6 +37,22 @@ def _mark_applied(conn, name):
     )
 
 
+EMBEDDING_TABLES = ['user_memories', 'bot_memories', 'episodic_summaries']
+
+
+def _add_embedding_bits(conn, table):
+    conn.execute(text(
+        f"ALTER TABLE {table} "
+        f"ADD COLUMN embedding_bits bit(384) "
+        f"GENERATED ALWAYS AS "
+        f"(binary_quantize(embedding)::bit(384)) STORED"
+    ))
+    conn.execute(text(
+        f"CREATE INDEX ix_{table}_embedding_bits "
+        f"ON {table} USING hnsw (embedding_bits bit_hamming_ops)"
+    ))
+
+
 # --- Migrations ---
 
 def migration_0001_sentiment_score_to_float(conn):
@@ -154,6 +170,81 @@ def migration_0007_create_episodic_summaries(conn):
         logger.info("Created episodic_summaries table")
 
 
+def migration_0008_full_text_search(conn):
+    """Add generated tsvector columns with GIN indexes for
+    lexical memory retrieval."""
+    for table, column in [
+        ('user_memories', 'fact'),
+        ('bot_memories', 'fact'),
+        ('episodic_summaries', 'summary'),
+    ]:
+        result = conn.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = :table "
+            "AND column_name = 'search_tsv'"
+        ), {"table": table})
+        if result.fetchone():
+            continue
+        conn.execute(text(
+            f"ALTER TABLE {table} "
+            f"ADD COLUMN search_tsv tsvector "
+            f"GENERATED ALWAYS AS "
+            f"(to_tsvector('english', coalesce({column}, ''))) "
+            f"STORED"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX ix_{table}_search_tsv "
+            f"ON {table} USING gin (search_tsv)"
+        ))
+        logger.info(f"Added search_tsv column to {table}")
+
+
+def migration_0009_create_episode_buffer(conn):
+    """Create the write-ahead table for in-flight episode buffers."""
+    result = conn.execute(text(
+        "SELECT 1 FROM information_schema.tables "
+        "WHERE table_name = 'episode_buffer'"
+    ))
+    if not result.fetchone():
+        conn.execute(text(
+            "CREATE TABLE episode_buffer ("
+            "  id BIGSERIAL PRIMARY KEY,"
+            "  channel_id VARCHAR NOT NULL,"
+            "  message_id BIGINT NOT NULL,"
+            "  author VARCHAR,"
+            "  author_id VARCHAR,"
+            "  content TEXT,"
+            "  is_bot BOOLEAN DEFAULT FALSE,"
+            "  created_at TIMESTAMPTZ"
+            ")"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_episode_buffer_channel "
+            "ON episode_buffer (channel_id, message_id)"
+        ))
+        logger.info("Created episode_buffer table")
+
+
+def migration_0010_summary_levels(conn):
+    """Add a rollup level to episodic summaries: 'episode' rows are
+    compacted into 'day', 'week' and then 'month' rows."""
+    result = conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'episodic_summaries' "
+        "AND column_name = 'level'"
+    ))
+    if not result.fetchone():
+        conn.execute(text(
+            "ALTER TABLE episodic_summaries "
+            "ADD COLUMN level VARCHAR(16) NOT NULL DEFAULT 'episode'"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_episodic_level_started "
+            "ON episodic_summaries (level, started_at)"
+        ))
+        logger.info("Added level column to episodic_summaries")
+
+
 # Register migrations in order. Each entry is (name, function).
 MIGRATIONS = [
     ("0001_sentiment_score_to_float",
@@ -170,6 +261,12 @@ MIGRATIONS = [
      migration_0006_bot_memory_embedding),
     ("0007_create_episodic_summaries",
      migration_0007_create_episodic_summaries),
+    ("0008_full_text_search",
+     migration_0008_full_text_search),
+    ("0009_create_episode_buffer",
+     migration_0009_create_episode_buffer),
+    ("0010_summary_levels",
+     migration_0010_summary_levels),
 ]
 
 
@@ -184,3 +281,104 @@ def run_migrations(engine):
             func(conn)
             _mark_applied(conn, name)
             logger.info(f"Migration complete: {name}")
+
+
+def apply_vector_storage(engine, storage):
+    """Convert embedding columns to the configured storage type.
+
+    `storage` is 'vector' (full precision) or 'halfvec' (half
+    precision, half the size). Unlike migrations this is re-checked
+    on every startup so the mode can be switched either way. A table
+    that can't be converted (halfvec needs pgvector >= 0.7) keeps its
+    current type. Returns the storage type the columns are left in,
+    for the query-side casts.
+    """
+    if storage not in ('vector', 'halfvec'):
+        logger.warning(f"Unknown VECTOR_STORAGE '{storage}', ignoring")
+        return 'vector'
+    target = f"{storage}(384)"
+    effective = storage
+    # One transaction per table, so a failed conversion only leaves
+    # that table on its current type
+    for table in EMBEDDING_TABLES:
+        row = None
+        try:
+            with engine.begin() as conn:
+                result = conn.execute(text(
+                    "SELECT format_type(atttypid, atttypmod) "
+                    "FROM pg_attribute "
+                    "WHERE attrelid = CAST(:table AS regclass) "
+                    "AND attname = 'embedding'"
+                ), {"table": table})
+                row = result.fetchone()
+                if not row or row[0] == target:
+                    continue
+                # The generated companion column depends on the
+                # column type, so drop it; apply_vector_search
+                # rebuilds it if binary search is on
+                conn.execute(text(
+                    f"ALTER TABLE {table} "
+                    f"DROP COLUMN IF EXISTS embedding_bits"
+                ))
+                conn.execute(text(
+                    f"ALTER TABLE {table} "
+                    f"ALTER COLUMN embedding TYPE {target} "
+                    f"USING embedding::{target}"
+                ))
+                logger.info(
+                    f"Converted {table}.embedding from {row[0]} "
+                    f"to {target}"
+                )
+        except Exception as e:
+            logger.warning(
+                f"Could not convert {table}.embedding to {target}, "
+                f"keeping the current type: {e}"
+            )
+            if row:
+                effective = row[0].split('(')[0]
+    return effective
+
+
+def _has_embedding_bits(conn, table):
+    result = conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = :table "
+        "AND column_name = 'embedding_bits'"
+    ), {"table": table})
+    return result.fetchone() is not None
+
+
+def apply_vector_search(engine, mode):
+    """Add or drop the binary-quantized companion columns to match
+    VECTOR_SEARCH_MODE.
+
+    The columns (and their HNSW indexes) only exist in 'binary'
+    mode, so 'exact' deployments don't pay for them. They are
+    generated from `embedding`, so existing rows are converted when
+    a column is added and later writes keep it in sync. Binary mode
+    needs pgvector >= 0.7; on an older extension this logs an error
+    and leaves the database as it was. Re-checked on every startup,
+    like apply_vector_storage.
+    """
+    binary = mode == 'binary'
+    try:
+        with engine.begin() as conn:
+            for table in EMBEDDING_TABLES:
+                if _has_embedding_bits(conn, table) == binary:
+                    continue
+                if binary:
+                    _add_embedding_bits(conn, table)
+                    logger.info(f"Added embedding_bits column to {table}")
+                else:
+                    conn.execute(text(
+                        f"ALTER TABLE {table} "
+                        f"DROP COLUMN embedding_bits"
+                    ))
+                    logger.info(
+                        f"Dropped embedding_bits column from {table}"
+                    )
+    except Exception as e:
+        logger.error(
+            f"Could not apply VECTOR_SEARCH_MODE '{mode}' "
+            f"(binary mode needs pgvector >= 0.7): {e}"
+        )
@@ -114,6 +114,10 @@ class EpisodicSummary(Base):
     embedding = Column(
         Vector(384) if Vector else String, nullable=True
     )
+    # 'episode', or the 'day' / 'week' / 'month' rollup it was
+    # compacted into
+    level = Column(String(16), nullable=False, default='episode',
+                   server_default='episode')
     created_at = Column(DateTime, server_default=func.now())
 
     def __init__(self, channel_id, summary, participant_ids=None,
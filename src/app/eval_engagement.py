@@ -0,0 +1,109 @@
+"""
+Labelled-replay evaluation of the local engagement classifier.
+
+Reads JSON lines as written to ENGAGEMENT_LOG_PATH. Each entry's
+label is its "label" field if someone hand-labelled it, otherwise the
+LLM's answer for escalated messages; unlabelled entries are skipped.
+Reports, for a range of thresholds, how many messages the classifier
+would still send to the LLM and how often its local decisions agree
+with the labels.
+
+Usage (from src/app):
+    python eval_engagement.py decisions.jsonl [--fit]
+"""
+import sys
+import json
+import math
+import argparse
+
+from cogs.engagement import (
+    WEIGHTS, ENGAGE_THRESHOLD, SKIP_THRESHOLD, score,
+)
+
+
+def load(path):
+    samples = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            label = entry.get('label', entry.get('llm_answer'))
+            if label is None:
+                continue
+            samples.append((entry['features'], bool(label)))
+    return samples
+
+
+def evaluate(samples, weights, engage, skip):
+    local = correct = escalated = 0
+    for features, label in samples:
+        p = score(features, weights)
+        if p >= engage or p <= skip:
+            local += 1
+            correct += (p >= engage) == label
+        else:
+            escalated += 1
+    return {
+        'escalated': escalated / len(samples),
+        'local_accuracy': correct / local if local else float('nan'),
+        'local': local,
+    }
+
+
+def fit(samples, epochs=500, lr=0.1):
+    """Plain logistic regression by gradient descent."""
+    weights = {name: 0.0 for name in WEIGHTS}
+    names = [name for name in WEIGHTS if name != 'bias']
+    for _ in range(epochs):
+        grads = {name: 0.0 for name in weights}
+        for features, label in samples:
+            z = weights['bias'] + sum(
+                weights[n] * features.get(n, 0.0) for n in names
+            )
+            err = 1.0 / (1.0 + math.exp(-z)) - float(label)
+            grads['bias'] += err
+            for n in names:
+                grads[n] += err * features.get(n, 0.0)
+        for name in weights:
+            weights[name] -= lr * grads[name] / len(samples)
+    return weights
+
+
+def report(samples, weights, title):
+    print(f"\n== {title} ==")
+    print(f"{'engage>=':>9}{'skip<=':>8}{'to LLM':>9}{'local acc':>11}")
+    for engage, skip in [
+        (ENGAGE_THRESHOLD, SKIP_THRESHOLD),
+        (0.9, 0.1), (0.8, 0.2), (0.7, 0.3), (0.6, 0.4), (0.5, 0.5),
+    ]:
+        r = evaluate(samples, weights, engage, skip)
+        print(
+            f"{engage:>9.2f}{skip:>8.2f}"
+            f"{r['escalated']:>9.0%}{r['local_accuracy']:>11.1%}"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('path')
+    parser.add_argument(
+        '--fit', action='store_true',
+        help="Also fit weights to the labels and report them"
+    )
+    args = parser.parse_args()
+
+    data = load(args.path)
+    if not data:
+        print("No labelled entries found")
+        sys.exit(1)
+    positives = sum(1 for _f, label in data if label)
+    print(f"{len(data)} labelled messages, {positives} directed at bot")
+    report(data, WEIGHTS, "current weights")
+    if args.fit:
+        fitted = fit(data)
+        report(data, fitted, "fitted weights (in-sample)")
+        print("\nFitted weights:")
+        for name, value in fitted.items():
+            print(f"    '{name}': {value:.2f},")
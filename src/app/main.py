@@ -11,7 +11,10 @@ from datetime import datetime
 from database.database import engine, Base, Session
 from database.orm import Link, LinkExclusion, StartupHistory
 from database.orm import UserMemory, BotMemory, UserSentiment, EpisodicSummary  # noqa: F401 - register with Base.metadata
-from database.migrations import run_migrations
+from database.migrations import (
+    run_migrations, apply_vector_storage, apply_vector_search,
+)
+from cogs import memory_manager
 
 # Configure logging
 def setup_logging():
@@ -59,6 +62,12 @@ def initialize_database(max_retries=5, retry_interval=3):
             # then create any new tables
             run_migrations(engine)
             Base.metadata.create_all(engine)
+            # Query casts must follow the type the columns really
+            # have if a conversion failed
+            memory_manager.VECTOR_STORAGE = apply_vector_storage(
+                engine, memory_manager.VECTOR_STORAGE
+            )
+            apply_vector_search(engine, memory_manager.VECTOR_SEARCH_MODE)
             db = Session()
             
             # Log startup history